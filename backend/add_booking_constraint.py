@@ -0,0 +1,49 @@
+from app import create_app, db
+from sqlalchemy import text
+
+CONSTRAINT_SQL = """
+ALTER TABLE appointments ADD CONSTRAINT appointments_no_overlap
+EXCLUDE USING gist (tsrange(date + start_time, date + end_time) WITH &&)
+WHERE (end_time > start_time)
+"""
+
+OVERLAPS_SQL = """
+SELECT a.id, b.id, a.date
+FROM appointments a
+JOIN appointments b ON a.date = b.date AND a.id < b.id
+    AND a.start_time < b.end_time AND b.start_time < a.end_time
+ORDER BY a.date
+LIMIT 20
+"""
+
+def add_booking_constraint():
+    """Add a PostgreSQL exclusion constraint that rejects overlapping appointments.
+
+    The booking routes already serialize writes per day with advisory locks;
+    this makes the database itself refuse a double booking as well, e.g. from
+    scripts or manual inserts. Existing overlaps have to be resolved first.
+    """
+    app = create_app()
+
+    with app.app_context():
+        if db.engine.dialect.name != 'postgresql':
+            print("Exclusion constraints need PostgreSQL - skipping.")
+            return
+
+        overlaps = db.session.execute(text(OVERLAPS_SQL)).fetchall()
+        if overlaps:
+            print("Existing overlapping appointments must be fixed first:")
+            for first_id, second_id, day in overlaps:
+                print(f"  {day}: appointments {first_id} and {second_id}")
+            return
+
+        try:
+            db.session.execute(text(CONSTRAINT_SQL))
+            db.session.commit()
+            print("Added appointments_no_overlap constraint.")
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error adding constraint: {str(e)}")
+
+if __name__ == '__main__':
+    add_booking_constraint()
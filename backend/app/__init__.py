@@ -1,5 +1,5 @@
 import os
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager
@@ -13,10 +13,52 @@ def create_app(config_class=Config):
     app = Flask(__name__, static_folder='static')
     app.config.from_object(config_class)
     
+    # Behind nginx every request comes from the proxy; trust its X-Forwarded-* headers
+    # so request.remote_addr (login rate limits, logs) is the real client address
+    if app.config.get('PROXY_FIX_X_FOR'):
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'],
+                                x_proto=app.config.get('PROXY_FIX_X_PROTO', 0))
+    
+    # Gallery uploads are streamed to disk and checked while the body arrives
+    from .utils.uploads import UploadRequest
+    app.request_class = UploadRequest
+    
+    # Structured, queue-backed logging for everything under app.* (first, so init logs go through it)
+    from .utils import structured_log
+    structured_log.init_app(app)
+    
+    # Per-endpoint latency / status / in-flight metrics, scraped at /metrics
+    from .utils.metrics import request_metrics
+    request_metrics.init_app(app)
+    
+    # Per-request query count / DB time (Server-Timing), slow-query log and N+1 warnings
+    from .utils import sql_profiler
+    sql_profiler.init_app(app)
+    
     # Initialize extensions
     db.init_app(app)
     jwt.init_app(app)
     
+    from .utils.availability import availability_index
+    from .utils.reference_cache import reference_cache
+    from .utils.slot_events import slot_events
+    from .utils.image_variants import image_variants
+    from .utils.identity_cache import identity_cache
+    from .utils.passwords import password_hasher
+    from .utils.token_revocation import token_revocation
+    from .utils import rate_limit
+    from .utils import stats_rollup
+    availability_index.init_app(app)
+    reference_cache.init_app(app)
+    slot_events.init_app(app)
+    image_variants.init_app(app)
+    identity_cache.init_app(app)
+    password_hasher.init_app(app)
+    token_revocation.init_app(app)
+    rate_limit.init_app(app)
+    stats_rollup.init_app(app)
+    
     # Improve JWT error handling
     @jwt.invalid_token_loader
     def invalid_token_callback(error_string):
@@ -32,11 +74,17 @@ def create_app(config_class=Config):
             'message': 'Please log in again'
         }), 401
     
-    # Log all requests for debugging
-    @app.before_request
-    def log_request_info():
-        app.logger.debug('Headers: %s', request.headers)
-        app.logger.debug('Body: %s', request.get_data())
+    # Revoked tokens (logout, password change) - no query unless the token looks revoked
+    @jwt.token_in_blocklist_loader
+    def check_if_token_revoked(jwt_header, jwt_payload):
+        return token_revocation.is_revoked(jwt_payload)
+    
+    @jwt.revoked_token_loader
+    def revoked_token_callback(jwt_header, jwt_payload):
+        return jsonify({
+            'error': 'Token has been revoked',
+            'message': 'Please log in again'
+        }), 401
     
     # Configure CORS more permissively
     CORS(app, 
@@ -58,16 +106,22 @@ def create_app(config_class=Config):
     from .routes.appointments import appointments_bp
     from .routes.gallery import gallery_bp
     from .routes.reviews import reviews_bp
+    from .routes.uploads import uploads_bp
+    from .routes.metrics import metrics_bp
     
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(services_bp, url_prefix='/api/services')
     app.register_blueprint(appointments_bp, url_prefix='/api/appointments')
     app.register_blueprint(gallery_bp, url_prefix='/api/gallery')
     app.register_blueprint(reviews_bp, url_prefix='/api/reviews')
+    # Takes precedence over the generic /static route for uploaded files
+    app.register_blueprint(uploads_bp, url_prefix='/static/uploads')
+    app.register_blueprint(metrics_bp)
     
     # Create database tables
     with app.app_context():
         db.create_all()
+        reference_cache.ensure_generations()
         from .models import User
         
         # Create admin user if not exists
@@ -80,9 +134,9 @@ def create_app(config_class=Config):
                 )
                 db.session.add(admin)
                 db.session.commit()
-                print("Admin user created during initialization.")
+                app.logger.info("Admin user created during initialization.")
         except Exception as e:
-            print(f"Error creating admin user: {str(e)}")
+            app.logger.error("Error creating admin user: %s", e)
             db.session.rollback()
     
     @app.route('/')
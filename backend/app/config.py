@@ -13,11 +13,130 @@ class Config:
     JWT_HEADER_NAME = 'Authorization'
     JWT_HEADER_TYPE = 'Bearer'
     JWT_ERROR_MESSAGE_KEY = 'error'
-    JWT_BLACKLIST_ENABLED = False
+    JWT_BLACKLIST_ENABLED = True  # logout / password change revoke tokens (utils/token_revocation.py)
     
     # Added to increase token security
     JWT_IDENTITY_CLAIM = 'sub'
     JWT_DECODE_ALGORITHMS = ['HS256']
     
+    # admin_required's user id -> role cache (seconds an entry is trusted, max entries)
+    IDENTITY_CACHE_TTL = 30
+    IDENTITY_CACHE_SIZE = 1024
+    
+    # Logging (utils/structured_log.py): JSON lines on stderr, written by a background thread.
+    # Sample rates are the share of requests whose DEBUG/INFO records (and access line) are kept;
+    # warnings and errors are always logged. Bodies are only logged with LOG_REQUEST_BODY.
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')  # or 'text'
+    LOG_QUEUE_SIZE = 10000  # records waiting to be written before new ones are dropped
+    LOG_SAMPLE_RATE = 1.0
+    LOG_ROUTE_SAMPLE_RATES = {
+        'appointments.get_available_slots': 0.1,
+        'appointments.get_available_slots_range': 0.1,
+        'uploads.serve_upload': 0.01,
+    }
+    LOG_REQUEST_BODY = False
+    LOG_REQUEST_BODY_MAX = 2048
+    
+    # Prometheus metrics at /metrics (per worker process); the scraper sends the token as a bearer
+    # token. Without METRICS_TOKEN the endpoint answers 404, except in DEBUG
+    METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    
+    # SQL profiler: statements slower than this are logged (None = off), a statement shape
+    # repeated this often in one request is logged as a likely N+1. Parameters are only logged
+    # with SQL_SLOW_QUERY_LOG_PARAMS, and never for users / revoked_tokens / appointments
+    SQL_SLOW_QUERY_MS = 200
+    SQL_SLOW_QUERY_LOG_PARAMS = False
+    SQL_N_PLUS_ONE_THRESHOLD = 10
+    SQL_SERVER_TIMING = True  # Server-Timing: db;dur=...;desc="N queries", total;dur=...
+    
+    # Revoked tokens: seconds between rebuilds of the in-memory filter from the database,
+    # seconds between reads of just the new revocations (the longest a logout / password
+    # change takes to reach the other workers), and the filter's size - 2^20 bits (128 KB)
+    # keep false positives around 1% up to ~100k live revocations
+    TOKEN_REVOCATION_SYNC_INTERVAL = 60
+    TOKEN_REVOCATION_POLL_INTERVAL = 2
+    TOKEN_REVOCATION_BLOOM_BITS = 1 << 20
+    TOKEN_REVOCATION_BLOOM_HASHES = 7
+    
+    # Password hashing runs on a process pool (0 workers = inline). Hashes made with
+    # another method / other parameters are upgraded on the next successful login.
+    # Pool and queue are per gunicorn worker: up to workers x PASSWORD_HASH_WORKERS hash
+    # processes, and the 503 on a full queue only happens with threaded workers (gthread) -
+    # a sync worker handles one login at a time and never fills its queue.
+    PASSWORD_HASH_METHOD = 'scrypt:32768:8:1'
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_MAX_PENDING = 8  # queued hashes before login answers 503
+    PASSWORD_HASH_TIMEOUT = 10
+    
+    # Number of reverse proxies in front of the app (nginx = 1) whose X-Forwarded-For /
+    # X-Forwarded-Proto are trusted. 0 when clients connect directly: the headers could be forged.
+    PROXY_FIX_X_FOR = int(os.environ.get('PROXY_FIX_X_FOR', 0))
+    PROXY_FIX_X_PROTO = int(os.environ.get('PROXY_FIX_X_PROTO', 0))
+    
+    # Sliding-window login limits: (attempts, seconds) per client IP, failed attempts per client IP + username,
+    # and failed attempts per username from all clients (higher, so one client can't lock an account out)
+    LOGIN_RATE_LIMIT_IP = (20, 60)
+    LOGIN_RATE_LIMIT_USERNAME = (5, 300)
+    LOGIN_RATE_LIMIT_ACCOUNT = (100, 900)
+    
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static/uploads')
-    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16 MB max upload 
\ No newline at end of file
+    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16 MB max upload
+    MAX_IMAGE_UPLOAD_SIZE = 10 * 1024 * 1024  # per gallery image, enforced while streaming
+    # Seconds a freshly stored upload is kept even if nothing references it yet
+    UPLOAD_REMOVE_GRACE = 60
+    # How /static/uploads files are delivered: 'app' (by the worker, sendfile and Range
+    # support), 'x-accel' (nginx X-Accel-Redirect) or 'x-sendfile' (Apache / lighttpd)
+    UPLOAD_SERVE_MODE = os.environ.get('UPLOAD_SERVE_MODE', 'app')
+    # nginx location for 'x-accel':
+    #   location /protected-uploads/ { internal; alias /path/to/backend/app/static/uploads/; }
+    UPLOAD_ACCEL_PREFIX = '/protected-uploads/'
+    
+    # Per-day availability index (seconds before a cached day is reloaded)
+    AVAILABILITY_INDEX_TTL = int(os.environ.get('AVAILABILITY_INDEX_TTL', 60))
+    AVAILABILITY_INDEX_MAX_DAYS = 366
+    AVAILABILITY_RANGE_MAX_DAYS = 62
+    
+    # Per-day booking locks (see app/utils/booking.py)
+    BOOKING_LOCK_TIMEOUT = 5  # seconds to wait for the in-process day lock
+    BOOKING_LOCK_ATTEMPTS = 40  # PostgreSQL advisory try-lock attempts
+    BOOKING_LOCK_BACKOFF = 0.005  # base backoff between attempts, seconds
+    BOOKING_LOCK_BACKOFF_MAX = 0.1
+    
+    # Reference data cache (services, business hours, blocked dates): how often
+    # a worker re-reads the cache_generations table to notice other workers' changes
+    REFERENCE_CACHE_CHECK_INTERVAL = float(os.environ.get('REFERENCE_CACHE_CHECK_INTERVAL', 1.0))
+    # ... and reloads a table after this many seconds even without a bump (writes that bypass bump())
+    REFERENCE_CACHE_MAX_AGE = int(os.environ.get('REFERENCE_CACHE_MAX_AGE', 300))
+    
+    # Keyset pagination for GET /api/appointments/?limit=&cursor=
+    APPOINTMENTS_PAGE_SIZE = 50
+    APPOINTMENTS_MAX_PAGE_SIZE = 200
+    
+    # Raise instead of logging a warning when a view exceeds its @query_budget
+    QUERY_BUDGET_STRICT = os.environ.get('QUERY_BUDGET_STRICT', '').lower() in ('1', 'true', 'yes')
+    
+    # Rows fetched per server-side cursor batch by GET /api/appointments/export/
+    EXPORT_BATCH_SIZE = 500
+    
+    # Rows per transaction for POST /api/appointments/import/ and import_appointments.py
+    IMPORT_CHUNK_SIZE = 500
+    
+    # Live slot-change events (GET /api/appointments/events/). Set SLOT_EVENTS_REDIS_URL
+    # (needs the redis package) to fan out across worker processes; otherwise each
+    # worker only streams its own changes. Long-lived streams need threaded or
+    # async gunicorn workers (e.g. --worker-class gthread --threads 8).
+    SLOT_EVENTS_REDIS_URL = os.environ.get('SLOT_EVENTS_REDIS_URL')
+    SLOT_EVENTS_HEARTBEAT = 15  # seconds between keep-alive comments
+    SLOT_EVENTS_MAX_STREAM = 300  # seconds before a stream is closed for the client to reconnect
+    SLOT_EVENTS_QUEUE_SIZE = 256  # pending events per stream before it is told to resync
+    
+    # Gallery image variants, generated in the background after upload (needs Pillow)
+    IMAGE_VARIANT_WIDTHS = (320, 640, 1024, 1600)
+    IMAGE_VARIANT_QUALITY = 80
+    IMAGE_VARIANT_WORKERS = 2
+    
+    # Keyset pagination for GET /api/gallery/?limit=&cursor=
+    GALLERY_PAGE_SIZE = 12
+    GALLERY_MAX_PAGE_SIZE = 60
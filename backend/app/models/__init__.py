@@ -4,4 +4,7 @@ from .service import Service
 from .appointment import Appointment
 from .gallery import GalleryImage
 from .business_hours import BusinessHours
-from .blocked_date import BlockedDate 
\ No newline at end of file
+from .blocked_date import BlockedDate 
+from .cache_generation import CacheGeneration
+from .daily_appointment_stats import DailyAppointmentStats
+from .revoked_token import RevokedToken
\ No newline at end of file
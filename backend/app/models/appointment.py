@@ -3,6 +3,12 @@ from .. import db
 
 class Appointment(db.Model):
     __tablename__ = 'appointments'
+    __table_args__ = (
+        # Day lookups, date ranges and the (date, start_time, id) keyset listing
+        db.Index('ix_appointments_date_start_time_id', 'date', 'start_time', 'id'),
+        db.Index('ix_appointments_status_date', 'status', 'date'),
+        db.Index('ix_appointments_service_id', 'service_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     service_id = db.Column(db.Integer, db.ForeignKey('services.id'), nullable=False)
@@ -23,12 +29,16 @@ class Appointment(db.Model):
     
     service = db.relationship('Service', backref='appointments')
     
-    def to_dict(self):
+    def to_dict(self, service=None):
+        # Callers serializing many rows pass the service from the cached
+        # catalogue, so the lazy relationship isn't loaded once per row
+        if service is None:
+            service = self.service
         return {
             'id': self.id,
             'service_id': self.service_id,
-            'service_name': self.service.name if self.service else None,
-            'service_duration': self.service.duration if self.service else None,
+            'service_name': service.name if service else None,
+            'service_duration': service.duration if service else None,
             'name': self.name,
             'phone': self.phone,
             'message': self.message,
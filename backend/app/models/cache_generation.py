@@ -0,0 +1,17 @@
+from datetime import datetime
+from .. import db
+
+class CacheGeneration(db.Model):
+    __tablename__ = 'cache_generations'
+    
+    # One row per cached table, e.g. 'services', 'business_hours', 'blocked_dates'
+    name = db.Column(db.String(50), primary_key=True)
+    generation = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'generation': self.generation,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
@@ -0,0 +1,24 @@
+from .. import db
+
+class DailyAppointmentStats(db.Model):
+    """Per date x status x service rollup of appointments, kept up to date on every flush."""
+    __tablename__ = 'daily_appointment_stats'
+    
+    date = db.Column(db.Date, primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    service_id = db.Column(db.Integer, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)  # sum of price
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)
+    rating_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def to_dict(self):
+        return {
+            'date': self.date.isoformat() if self.date else None,
+            'status': self.status,
+            'service_id': self.service_id,
+            'count': self.count,
+            'revenue': self.revenue,
+            'rating_sum': self.rating_sum,
+            'rating_count': self.rating_count
+        }
@@ -3,16 +3,47 @@ from .. import db
 
 class GalleryImage(db.Model):
     __tablename__ = 'gallery_images'
+    __table_args__ = (
+        db.Index('ix_gallery_images_created_at_id', 'created_at', 'id'),
+        db.Index('ix_gallery_images_content_hash', 'content_hash'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=True)
     file_path = db.Column(db.String(255), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)  # keyset pagination key
+    # sha256 of the file for content-addressed uploads (see utils/gallery_storage.py);
+    # images sharing it share the file, which is removed with the last of them
+    content_hash = db.Column(db.String(64), nullable=True)
+    # Resized copies, filled in the background after upload (see utils/image_variants.py):
+    # [{'width': 320, 'height': 240, 'type': 'image/webp', 'url': '/static/uploads/..._320w.webp'}, ...]
+    variants = db.Column(db.JSON, nullable=True)
+    
+    def srcset(self):
+        """``srcset`` strings per mime type, e.g. for <picture><source type=... srcset=...>"""
+        sets = {}
+        for variant in self.variants or []:
+            sets.setdefault(variant['type'], []).append(f"{variant['url']} {variant['width']}w")
+        return {mime_type: ', '.join(entries) for mime_type, entries in sets.items()}
+    
+    def thumbnail_url(self):
+        """Smallest non-WebP variant, or the original while the variants are still being generated"""
+        fallbacks = [v for v in self.variants or [] if v['type'] != 'image/webp']
+        return min(fallbacks, key=lambda v: v['width'])['url'] if fallbacks else self.file_path
+    
+    def to_thumbnail_dict(self):
+        return {
+            'id': self.id,
+            'thumbnail': self.thumbnail_url()
+        }
     
     def to_dict(self):
         return {
             'id': self.id,
             'title': self.title,
             'file_path': self.file_path,
+            'thumbnail': self.thumbnail_url(),
+            'srcset': self.srcset(),
+            'variants': self.variants or [],
             'created_at': self.created_at.isoformat() if self.created_at else None
         } 
\ No newline at end of file
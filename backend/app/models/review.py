@@ -3,6 +3,10 @@ from app import db
 
 class Review(db.Model):
     __tablename__ = 'reviews'
+    __table_args__ = (
+        db.Index('ix_reviews_is_approved_created_at', 'is_approved', 'created_at'),
+        db.Index('ix_reviews_created_at', 'created_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     client_name = db.Column(db.String(100), nullable=False)
@@ -7,6 +7,13 @@ class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(64), unique=True, nullable=False)
     password_hash = db.Column(db.String(256), nullable=False)
+    # Tokens issued before this moment are rejected (set on password change)
+    tokens_valid_after = db.Column(db.DateTime, nullable=True)
+    
+    @property
+    def role(self):
+        # Администратор е потребителят 'admin'; ролята влиза в JWT токена при вход
+        return 'admin' if self.username == 'admin' else 'user'
     
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
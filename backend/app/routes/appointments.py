@@ -1,42 +1,74 @@
+import csv
+import io
+import json
+import logging
+import time as _time
+from contextlib import nullcontext
 from datetime import datetime, time, timedelta
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
 from flask_jwt_extended import jwt_required
-from sqlalchemy import and_, or_, desc
-from ..models import Appointment, Service, BusinessHours, BlockedDate
+from sqlalchemy import desc, tuple_
+from sqlalchemy.exc import IntegrityError
+from ..models import Appointment, BusinessHours, BlockedDate, DailyAppointmentStats
+from .auth import admin_required
+from ..utils.availability import availability_index
+from ..utils.booking import BookingBusy, booking_lock, is_overlap_violation
+from ..utils.bulk_import import import_appointments, read_rows
+from ..utils.http_cache import conditional
+from ..utils.pagination import decode_cursor, encode_cursor, page_size
+from ..utils.query_budget import query_budget
+from ..utils.reference_cache import BLOCKED_DATES, BUSINESS_HOURS, get_service, get_services, reference_cache
+from ..utils.scheduling import (
+    BLOCKED, CLOSED, OUTSIDE_HOURS, OVERLAP, format_minutes, load_day_schedule, to_minutes
+)
+from ..utils.slot_events import CREATED, DELETED, UPDATED, slot_event, slot_events
 from .. import db
 
 appointments_bp = Blueprint('appointments', __name__)
+logger = logging.getLogger(__name__)
 
-def is_time_available(date, start_time, end_time):
-    # Check if date is blocked
-    blocked = BlockedDate.query.filter_by(date=date).first()
-    if blocked:
-        return False
-    
-    # Check if within business hours
-    day_of_week = date.weekday()  # 0=Monday, 6=Sunday
-    business_hours = BusinessHours.query.filter_by(day_of_week=day_of_week).first()
-    
-    if not business_hours or not business_hours.is_open:
-        return False
-    
-    if start_time < business_hours.open_time or end_time > business_hours.close_time:
-        return False
-    
-    # Check for overlapping appointments
-    overlapping = Appointment.query.filter(
-        Appointment.date == date,
-        or_(
-            and_(Appointment.start_time <= start_time, Appointment.end_time > start_time),
-            and_(Appointment.start_time < end_time, Appointment.end_time >= end_time),
-            and_(Appointment.start_time >= start_time, Appointment.end_time <= end_time)
-        )
-    ).first()
-    
-    return overlapping is None
+def check_time_slot(date, start_time, end_time, exclude_id=None):
+    """Return None if the slot can be booked, otherwise a scheduling reason code.
+
+    Always reads the day fresh from the database: the in-memory index may be
+    behind bookings made by other workers, which is fine for listing slots
+    but not for accepting a booking.
+    """
+    schedule = load_day_schedule(date)
+    return schedule.check(to_minutes(start_time), to_minutes(end_time), exclude_id)
+
+def filter_appointments(query, args):
+    """Apply the start_date/end_date/status/service_id list filters from ``args``.
+
+    status and service_id accept comma-separated lists. Raises ValueError on
+    malformed values.
+    """
+    if args.get('start_date'):
+        query = query.filter(Appointment.date >= datetime.strptime(args['start_date'], '%Y-%m-%d').date())
+    if args.get('end_date'):
+        query = query.filter(Appointment.date <= datetime.strptime(args['end_date'], '%Y-%m-%d').date())
+    if args.get('status'):
+        query = query.filter(Appointment.status.in_([s for s in args['status'].split(',') if s]))
+    if args.get('service_id'):
+        query = query.filter(Appointment.service_id.in_([int(s) for s in args['service_id'].split(',') if s]))
+    return query
+
+def serialize_appointment(appointment, services=None):
+    """appointment.to_dict() with the service taken from the cached catalogue."""
+    if services is None:
+        services = get_services()
+    return appointment.to_dict(service=services.get(appointment.service_id))
 
 @appointments_bp.route('/', methods=['GET'])
+@query_budget(3)
 def get_appointments():
+    """List appointments ordered by date, start time and id.
+
+    Passing ``limit`` and/or ``cursor`` switches to keyset pagination on
+    (date, start_time, id): each page is one index range scan and the
+    response carries a ``next_cursor`` for the following page. Without them
+    the full filtered list is returned as before.
+    """
     try:
         # Опционално филтриране по дата
         date_filter = request.args.get('date')
@@ -46,42 +78,168 @@ def get_appointments():
         if date_filter:
             try:
                 filter_date = datetime.strptime(date_filter, '%Y-%m-%d').date()
-                print(f"Филтриране на резервации за дата: {filter_date}")
+                logger.debug("Филтриране на резервации за дата: %s", filter_date)
                 query = query.filter(Appointment.date == filter_date)
             except ValueError:
-                print(f"Невалиден формат на дата: {date_filter}")
-        
-        # Сортиране първо по дата, след това по начален час
-        appointments = query.order_by(Appointment.date, Appointment.start_time).all()
-        print(f"Намерени {len(appointments)} резервации")
+                logger.info("Невалиден формат на дата: %s", date_filter)
         
-        # Добавяме имената на услугите към резултата
-        result = []
-        for appointment in appointments:
-            appointment_dict = appointment.to_dict()
-            
-            # Добавяме информация за услугата
-            if appointment.service:
-                appointment_dict['service_name'] = appointment.service.name
-                appointment_dict['service_duration'] = appointment.service.duration
+        paginate = 'limit' in request.args or 'cursor' in request.args
+        try:
+            query = filter_appointments(query, request.args)
             
-            result.append(appointment_dict)
+            if paginate:
+                limit = page_size(request.args.get('limit'), 'APPOINTMENTS_PAGE_SIZE', 'APPOINTMENTS_MAX_PAGE_SIZE')
+                cursor = request.args.get('cursor')
+                if cursor:
+                    last_date, last_start, last_id = decode_cursor(cursor, 3)
+                    query = query.filter(tuple_(Appointment.date, Appointment.start_time, Appointment.id) > tuple_(
+                        datetime.strptime(last_date, '%Y-%m-%d').date(),
+                        datetime.strptime(last_start, '%H:%M:%S').time(),
+                        int(last_id)
+                    ))
+        except (ValueError, TypeError):
+            return jsonify({'message': 'Invalid filter, limit or cursor'}), 400
         
+        # Сортиране първо по дата, след това по начален час
+        query = query.order_by(Appointment.date, Appointment.start_time, Appointment.id)
+        
+        next_cursor = None
+        if paginate:
+            # Една допълнителна резервация показва дали има следваща страница
+            appointments = query.limit(limit + 1).all()
+            if len(appointments) > limit:
+                appointments = appointments[:limit]
+                last = appointments[-1]
+                next_cursor = encode_cursor([
+                    last.date.isoformat(), last.start_time.strftime('%H:%M:%S'), last.id
+                ])
+        else:
+            appointments = query.all()
+        logger.debug("Намерени %d резервации", len(appointments))
+        
+        # Имената на услугите идват от кеша, а не с отделна заявка за всяка резервация
+        services = get_services()
+        result = [serialize_appointment(appointment, services) for appointment in appointments]
+        
+        if paginate:
+            return jsonify({'appointments': result, 'next_cursor': next_cursor}), 200
         return jsonify({'appointments': result}), 200
     except Exception as e:
         error_msg = f"Грешка при извличане на резервации: {str(e)}"
-        print(error_msg)
+        logger.exception("Грешка при извличане на резервации")
         return jsonify({'message': error_msg}), 500
 
+EXPORT_FIELDS = [
+    'id', 'date', 'start_time', 'end_time', 'service_id', 'service_name', 'service_duration',
+    'name', 'phone', 'message', 'price', 'status', 'barber_notes', 'client_rating',
+    'client_feedback', 'created_at'
+]
+
+@appointments_bp.route('/export/', methods=['GET'])
+@admin_required
+def export_appointments():
+    """Stream appointments as NDJSON (default) or CSV with constant memory.
+
+    Rows are read through a server-side cursor in EXPORT_BATCH_SIZE batches
+    and written out batch by batch as a chunked response; nothing holds the
+    full result set. Accepts the same filters as the listing.
+    """
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({'message': 'format must be ndjson or csv'}), 400
+    
+    try:
+        query = filter_appointments(Appointment.query, request.args)
+    except (ValueError, TypeError):
+        return jsonify({'message': 'Invalid filter'}), 400
+    
+    batch_size = current_app.config.get('EXPORT_BATCH_SIZE', 500)
+    query = query.order_by(Appointment.date, Appointment.start_time, Appointment.id).yield_per(batch_size)
+    
+    def generate():
+        services = get_services()
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS, extrasaction='ignore')
+        if export_format == 'csv':
+            writer.writeheader()
+        
+        rows = 0
+        for appointment in query:
+            row = serialize_appointment(appointment, services)
+            if export_format == 'csv':
+                writer.writerow(row)
+            else:
+                buffer.write(json.dumps(row, ensure_ascii=False))
+                buffer.write('\n')
+            
+            rows += 1
+            if rows % batch_size == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        
+        yield buffer.getvalue()
+    
+    filename = f"appointments-{datetime.utcnow():%Y%m%d}.{export_format}"
+    mimetype = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    return Response(stream_with_context(generate()), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename="{filename}"'
+    })
+
+@appointments_bp.route('/import/', methods=['POST'])
+@admin_required
+def import_appointments_route():
+    """Bulk import appointments from a JSON body or an uploaded .csv/.ndjson/.json file.
+
+    Options (query string or JSON body): enforce_business_hours (default
+    true; turn off for historical records), dry_run (default false).
+    """
+    options = request.args.to_dict()
+    try:
+        if 'file' in request.files:
+            upload = request.files['file']
+            rows = read_rows(upload.stream, upload.filename or '')
+            options.update(request.form.to_dict())
+        else:
+            data = request.get_json(silent=True)
+            if isinstance(data, dict):
+                rows = data.get('appointments')
+                options.update({k: v for k, v in data.items() if k != 'appointments'})
+            else:
+                rows = data
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({'message': f'Invalid import file: {str(e)}'}), 400
+    
+    if not isinstance(rows, list):
+        return jsonify({'message': 'Expected a list of appointments'}), 400
+    
+    def flag(name, default):
+        value = options.get(name, default)
+        return value if isinstance(value, bool) else str(value).lower() in ('1', 'true', 'yes')
+    
+    try:
+        report = import_appointments(
+            rows,
+            chunk_size=current_app.config.get('IMPORT_CHUNK_SIZE', 500),
+            enforce_business_hours=flag('enforce_business_hours', True),
+            dry_run=flag('dry_run', False)
+        )
+    except BookingBusy:
+        db.session.rollback()
+        return jsonify({'message': 'Too many simultaneous bookings, please try again'}), 503, {'Retry-After': '1'}
+    
+    return jsonify(report), 200
+
 @appointments_bp.route('/<int:appointment_id>/', methods=['GET'])
 @jwt_required()
+@query_budget(3)
 def get_appointment(appointment_id):
     appointment = Appointment.query.get(appointment_id)
     
     if not appointment:
         return jsonify({'message': 'Appointment not found'}), 404
     
-    return jsonify({'appointment': appointment.to_dict()}), 200
+    return jsonify({'appointment': serialize_appointment(appointment)}), 200
 
 @appointments_bp.route('/', methods=['POST'])
 def create_appointment():
@@ -91,7 +249,7 @@ def create_appointment():
         return jsonify({'message': 'Missing required fields'}), 400
     
     try:
-        service = Service.query.get(data['service_id'])
+        service = get_service(data['service_id'])
         if not service:
             return jsonify({'message': 'Service not found'}), 404
         
@@ -103,55 +261,77 @@ def create_appointment():
         end_datetime = start_datetime + timedelta(minutes=service.duration)
         end_time = end_datetime.time()
         
-        if not is_time_available(date, start_time, end_time):
-            return jsonify({'message': 'The selected time is not available'}), 400
-        
-        appointment = Appointment(
-            service_id=service.id,
-            name=data['name'],
-            phone=data['phone'],
-            message=data.get('message', ''),
-            date=date,
-            start_time=start_time,
-            end_time=end_time,
-            price=service.price,
-            status='pending'
-        )
+        # Only bookings for the same day wait for each other; the check, the
+        # insert and the commit all happen under the lock
+        with booking_lock(date):
+            # Read the day fresh: the availability index may lag other workers
+            schedule = load_day_schedule(date)
+            if schedule.check(to_minutes(start_time), to_minutes(end_time)) is not None:
+                next_start = schedule.next_free(service.duration, after=to_minutes(start_time))
+                return jsonify({
+                    'message': 'The selected time is not available',
+                    'next_available': format_minutes(next_start) if next_start is not None else None
+                }), 400
+            
+            appointment = Appointment(
+                service_id=service.id,
+                name=data['name'],
+                phone=data['phone'],
+                message=data.get('message', ''),
+                date=date,
+                start_time=start_time,
+                end_time=end_time,
+                price=service.price,
+                status='pending'
+            )
+            
+            db.session.add(appointment)
+            try:
+                db.session.commit()
+            except IntegrityError as e:
+                # The optional appointments_no_overlap constraint caught it
+                db.session.rollback()
+                if is_overlap_violation(e):
+                    return jsonify({'message': 'The selected time is not available'}), 400
+                raise
         
-        db.session.add(appointment)
-        db.session.commit()
+        availability_index.add_appointment(appointment)
+        slot_events.publish(slot_event(CREATED, appointment))
         
-        return jsonify({'appointment': appointment.to_dict()}), 201
+        return jsonify({'appointment': serialize_appointment(appointment)}), 201
     
     except ValueError:
         return jsonify({'message': 'Invalid date or time format'}), 400
+    except BookingBusy:
+        db.session.rollback()
+        return jsonify({'message': 'Too many simultaneous bookings, please try again'}), 503, {'Retry-After': '1'}
 
 @appointments_bp.route('/<int:appointment_id>/', methods=['PUT'])
 # Временно премахваме @jwt_required() за тестване
 def update_appointment(appointment_id):
     try:
-        print(f"Опит за актуализиране на резервация с ID: {appointment_id}")
         appointment = Appointment.query.get(appointment_id)
         
         if not appointment:
-            print(f"Резервация с ID {appointment_id} не е намерена")
+            logger.info("Резервация с ID %s не е намерена", appointment_id)
             return jsonify({'message': 'Appointment not found'}), 404
         
         data = request.get_json()
-        print(f"Получени данни: {data}")
+        logger.debug("Актуализиране на резервация", extra={'appointment_id': appointment_id, 'fields': sorted(data or {})})
         
         try:
             # Запазване на оригиналните стойности за проверка на промените
             original_date = appointment.date
             original_start_time = appointment.start_time
+            original_end_time = appointment.end_time
             original_service_id = appointment.service_id
             
             # Обработка на промяна на услугата
             if 'service_id' in data and data['service_id']:
                 service_id = int(data['service_id'])
-                service = Service.query.get(service_id)
+                service = get_service(service_id)
                 if not service:
-                    print(f"Услуга с ID {service_id} не е намерена")
+                    logger.info("Услуга с ID %s не е намерена", service_id)
                     return jsonify({'message': 'Service not found'}), 404
                 appointment.service_id = service_id
             
@@ -182,60 +362,65 @@ def update_appointment(appointment_id):
             date_changed = 'date' in data and appointment.date != original_date
             time_changed = 'start_time' in data and appointment.start_time != original_start_time
             
-            if service_changed or date_changed or time_changed:
+            timing_changed = service_changed or date_changed or time_changed
+            
+            if timing_changed:
                 start_datetime = datetime.combine(appointment.date, appointment.start_time)
-                end_datetime = start_datetime + timedelta(minutes=appointment.service.duration)
+                end_datetime = start_datetime + timedelta(minutes=get_service(appointment.service_id).duration)
                 appointment.end_time = end_datetime.time()
+            
+            # Заключваме и стария, и новия ден до commit, за да няма двойни резервации
+            with booking_lock(original_date, appointment.date) if timing_changed else nullcontext():
+                if timing_changed:
+                    # Проверка за достъпност само ако има промяна в датата, часа или услугата
+                    # При проверката за достъпност не трябва да се взема предвид текущата резервация
+                    reason = check_time_slot(appointment.date, appointment.start_time, appointment.end_time,
+                                             exclude_id=appointment.id)
+                    
+                    if reason:
+                        logger.info("Часът не е достъпен", extra={
+                            'appointment_id': appointment.id, 'reason': reason, 'date': appointment.date,
+                            'start_time': appointment.start_time, 'end_time': appointment.end_time
+                        })
+                    
+                    if reason == OVERLAP:
+                        return jsonify({'message': 'The selected time is not available'}), 400
+                    
+                    if reason == CLOSED:
+                        return jsonify({'message': 'The selected day is not a business day'}), 400
+                    
+                    if reason == OUTSIDE_HOURS:
+                        return jsonify({'message': 'The selected time is outside business hours'}), 400
+                    
+                    if reason == BLOCKED:
+                        return jsonify({'message': 'The selected date is blocked'}), 400
                 
-                # Проверка за достъпност само ако има промяна в датата, часа или услугата
-                print(f"Проверка за достъпност на час: {appointment.date} {appointment.start_time} - {appointment.end_time}")
-                
-                # При проверката за достъпност не трябва да се взема предвид текущата резервация
-                # Извличаме всички резервации за деня, освен текущата
-                overlapping = Appointment.query.filter(
-                    Appointment.date == appointment.date,
-                    Appointment.id != appointment.id,
-                    or_(
-                        and_(Appointment.start_time <= appointment.start_time, Appointment.end_time > appointment.start_time),
-                        and_(Appointment.start_time < appointment.end_time, Appointment.end_time >= appointment.end_time),
-                        and_(Appointment.start_time >= appointment.start_time, Appointment.end_time <= appointment.end_time)
-                    )
-                ).first()
-                
-                if overlapping:
-                    print(f"Часът не е достъпен - има припокриване с резервация ID: {overlapping.id}")
-                    return jsonify({'message': 'The selected time is not available'}), 400
-                
-                # Проверка за работно време
-                day_of_week = appointment.date.weekday()
-                business_hours = BusinessHours.query.filter_by(day_of_week=day_of_week).first()
-                
-                if not business_hours or not business_hours.is_open:
-                    print(f"Денят не е работен: {appointment.date}")
-                    return jsonify({'message': 'The selected day is not a business day'}), 400
-                
-                if appointment.start_time < business_hours.open_time or appointment.end_time > business_hours.close_time:
-                    print(f"Часът е извън работното време: {appointment.start_time} - {appointment.end_time}")
-                    return jsonify({'message': 'The selected time is outside business hours'}), 400
-                
-                # Проверка за блокирана дата
-                blocked = BlockedDate.query.filter_by(date=appointment.date).first()
-                if blocked:
-                    print(f"Датата е блокирана: {appointment.date}")
-                    return jsonify({'message': 'The selected date is blocked'}), 400
+                try:
+                    db.session.commit()
+                except IntegrityError as e:
+                    db.session.rollback()
+                    if is_overlap_violation(e):
+                        return jsonify({'message': 'The selected time is not available'}), 400
+                    raise
             
-            db.session.commit()
-            print(f"Резервация с ID {appointment_id} успешно актуализирана")
+            availability_index.remove_appointment(appointment.id, original_date)
+            availability_index.add_appointment(appointment)
+            previous = (original_date, original_start_time, original_end_time) if timing_changed else None
+            slot_events.publish(slot_event(UPDATED, appointment, previous))
+            logger.info("Резервация с ID %s успешно актуализирана", appointment_id)
             
-            return jsonify({'appointment': appointment.to_dict()}), 200
+            return jsonify({'appointment': serialize_appointment(appointment)}), 200
         
         except ValueError as e:
-            print(f"Грешка при обработка на стойностите: {str(e)}")
+            logger.info("Грешка при обработка на стойностите: %s", e)
             return jsonify({'message': 'Invalid date or time format'}), 400
+    except BookingBusy:
+        db.session.rollback()
+        return jsonify({'message': 'Too many simultaneous bookings, please try again'}), 503, {'Retry-After': '1'}
     except Exception as e:
         db.session.rollback()
         error_msg = f"Грешка при актуализиране на резервация: {str(e)}"
-        print(error_msg)
+        logger.exception("Грешка при актуализиране на резервация %s", appointment_id)
         return jsonify({'message': error_msg}), 500
 
 # Дублиращ маршрут без наклонена черта в края
@@ -247,23 +432,25 @@ def update_appointment_alt(appointment_id):
 # Временно премахваме @jwt_required() за тестване
 def delete_appointment(appointment_id):
     try:
-        print(f"Опит за изтриване на резервация с ID: {appointment_id}")
         appointment = Appointment.query.get(appointment_id)
         
         if not appointment:
-            print(f"Резервация с ID {appointment_id} не е намерена")
+            logger.info("Резервация с ID %s не е намерена", appointment_id)
             return jsonify({'message': 'Appointment not found'}), 404
         
-        print(f"Намерена резервация: {appointment.to_dict()}")
+        appointment_date = appointment.date
+        event = slot_event(DELETED, appointment)
         db.session.delete(appointment)
         db.session.commit()
+        availability_index.remove_appointment(appointment_id, appointment_date)
+        slot_events.publish(event)
         
-        print(f"Резервация с ID {appointment_id} успешно изтрита")
+        logger.info("Резервация с ID %s успешно изтрита", appointment_id)
         return jsonify({'message': 'Appointment deleted successfully'}), 200
     except Exception as e:
         db.session.rollback()
         error_msg = f"Грешка при изтриване на резервация: {str(e)}"
-        print(error_msg)
+        logger.exception("Грешка при изтриване на резервация %s", appointment_id)
         return jsonify({'message': error_msg}), 500
 
 # Дублиращ маршрут без наклонена черта в края
@@ -271,13 +458,65 @@ def delete_appointment(appointment_id):
 def delete_appointment_alt(appointment_id):
     return delete_appointment(appointment_id)
 
+@appointments_bp.route('/events/', methods=['GET'])
+def appointment_events():
+    """Server-Sent Events stream of slot changes, instead of polling available-slots/.
+
+    Each ``slot`` event is a JSON object with action (created / updated /
+    deleted / reload), date, start and end (plus id, status and the
+    previous date and times for moved appointments). A ``resync`` event
+    means events were dropped and the client should reload its view.
+    Optional start_date / end_date (YYYY-MM-DD) limit the stream to those days.
+    """
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    try:
+        for value in (start_date, end_date):
+            if value:
+                datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        return jsonify({'message': 'Invalid date format'}), 400
+    
+    heartbeat = current_app.config.get('SLOT_EVENTS_HEARTBEAT', 15)
+    max_stream = current_app.config.get('SLOT_EVENTS_MAX_STREAM', 300)
+    
+    def in_range(event):
+        dates = [event['date']] + ([event['previous']['date']] if 'previous' in event else [])
+        # ISO dates compare correctly as strings
+        return any((not start_date or d >= start_date) and (not end_date or d <= end_date) for d in dates)
+    
+    def generate():
+        subscription = slot_events.subscribe()
+        # Streams end after max_stream seconds so workers are freed; EventSource reconnects on its own
+        deadline = _time.monotonic() + max_stream
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                remaining = deadline - _time.monotonic()
+                if remaining <= 0:
+                    return
+                item = subscription.get(timeout=min(heartbeat, remaining))
+                if subscription.overflowed:
+                    subscription.reset()
+                    yield 'event: resync\ndata: {}\n\n'
+                elif item is None:
+                    yield ': keep-alive\n\n'
+                elif in_range(item[1]):
+                    event_id, event = item
+                    yield f"id: {event_id}\nevent: slot\ndata: {json.dumps(event)}\n\n"
+        finally:
+            slot_events.unsubscribe(subscription)
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # nginx: pass events through unbuffered
+    })
+
 @appointments_bp.route('/available-slots/', methods=['GET'])
 def get_available_slots():
     date_str = request.args.get('date')
     service_id = request.args.get('service_id')
     
-    print(f"Debug: Received request for available slots with date={date_str}, service_id={service_id}")
-    
     if not date_str:
         return jsonify({'message': 'Date parameter is required'}), 400
     
@@ -288,70 +527,23 @@ def get_available_slots():
         service_duration = 30  # default duration in minutes
         
         if service_id:
-            service = Service.query.get(service_id)
+            service = get_service(service_id)
             if service:
                 service_duration = service.duration
         
-        # Check if date is blocked
-        blocked = BlockedDate.query.filter_by(date=date).first()
-        if blocked:
-            return jsonify({'available_slots': [], 'booked_slots': []}), 200
-        
-        # Get business hours for the day
-        day_of_week = date.weekday()
-        business_hours = BusinessHours.query.filter_by(day_of_week=day_of_week).first()
-        
-        if not business_hours or not business_hours.is_open:
+        # Blocked date, business hours and bookings come from the per-day index
+        day = availability_index.get_day(date)
+        if not day.is_open:
             return jsonify({'available_slots': [], 'booked_slots': []}), 200
         
-        # Get all appointments for the day
-        appointments = Appointment.query.filter_by(date=date).order_by(Appointment.start_time).all()
-        print(f"Debug: Found {len(appointments)} existing appointments for {date_str}")
-        
-        # Calculate available slots
-        available_slots = []
-        booked_slots = []
-        all_slots = []
-        current_time = business_hours.open_time
-        service_duration_td = timedelta(minutes=service_duration)
-        
-        print(f"Debug: Generating slots from {current_time} to {business_hours.close_time} with duration {service_duration}")
-        
-        while True:
-            # Convert time to datetime for easier calculation
-            current_datetime = datetime.combine(date, current_time)
-            end_datetime = current_datetime + service_duration_td
-            
-            # Check if end time exceeds business hours
-            if end_datetime.time() > business_hours.close_time:
-                break
-            
-            # Add to all slots
-            current_slot = current_time.strftime('%H:%M')
-            all_slots.append(current_slot)
-            
-            # Check if slot overlaps with any appointment
-            is_available = True
-            for appointment in appointments:
-                appt_start = datetime.combine(date, appointment.start_time)
-                appt_end = datetime.combine(date, appointment.end_time)
-                
-                if (current_datetime < appt_end and end_datetime > appt_start):
-                    is_available = False
-                    # Add to booked slots if not already present
-                    if current_slot not in booked_slots:
-                        booked_slots.append(current_slot)
-                    break
-            
-            if is_available:
-                available_slots.append(current_slot)
-            
-            # Move to next slot (30-minute intervals)
-            current_datetime += timedelta(minutes=30)
-            current_time = current_datetime.time()
+        all_slots, available_slots, booked_slots = (
+            [format_minutes(m) for m in slots] for slots in day.slots(service_duration)
+        )
         
-        print(f"Debug: Generated {len(available_slots)} available slots")
-        print(f"Debug: Found {len(booked_slots)} booked slots")
+        logger.debug("Available slots", extra={
+            'date': date_str, 'service_id': service_id, 'bookings': len(day.bookings),
+            'available': len(available_slots), 'booked': len(booked_slots)
+        })
         
         return jsonify({
             'available_slots': available_slots,
@@ -360,53 +552,124 @@ def get_available_slots():
         }), 200
     
     except ValueError as e:
-        print(f"Debug: Error processing available slots: {str(e)}")
         return jsonify({'message': 'Invalid date format'}), 400
     except Exception as e:
-        print(f"Debug: Unexpected error: {str(e)}")
+        logger.exception("Error retrieving available slots for %s", date_str)
         return jsonify({'message': f'Error retrieving available slots: {str(e)}'}), 500
 
+@appointments_bp.route('/available-slots/range/', methods=['GET'])
+def get_available_slots_range():
+    """Available slots for every day in a date range, optionally per service.
+
+    Replaces one available-slots/ call per date and service: blocked dates,
+    business hours and appointments for the whole range are loaded in one
+    batch and every day is computed in the same pass.
+    """
+    start_date_str = request.args.get('start_date')
+    end_date_str = request.args.get('end_date')
+    
+    if not start_date_str or not end_date_str:
+        return jsonify({'message': 'start_date and end_date parameters are required'}), 400
+    
+    try:
+        start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
+        end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
+        
+        # service_id може да бъде подаден няколко пъти или като списък, разделен със запетаи
+        service_ids = []
+        for value in request.args.getlist('service_id'):
+            service_ids.extend(int(part) for part in value.split(',') if part.strip())
+    except ValueError:
+        return jsonify({'message': 'Invalid date format or service_id'}), 400
+    
+    if end_date < start_date:
+        return jsonify({'message': 'end_date must not be before start_date'}), 400
+    
+    max_days = current_app.config.get('AVAILABILITY_RANGE_MAX_DAYS', 62)
+    if (end_date - start_date).days + 1 > max_days:
+        return jsonify({'message': f'Date range cannot exceed {max_days} days'}), 400
+    
+    # Without services fall back to the same 30 minute default as available-slots/
+    durations = {'default': 30}
+    if service_ids:
+        services = get_services()
+        durations = {str(sid): services[sid].duration for sid in service_ids if sid in services}
+    
+    days = {}
+    for day in availability_index.get_range(start_date, end_date):
+        day_slots = {}
+        for key, duration in durations.items():
+            all_slots, available_slots, booked_slots = (
+                [format_minutes(m) for m in slots] for slots in day.slots(duration)
+            )
+            day_slots[key] = {
+                'available_slots': available_slots,
+                'booked_slots': booked_slots,
+                'all_slots': all_slots
+            }
+        days[day.date.isoformat()] = {'is_open': day.is_open, 'services': day_slots}
+    
+    return jsonify({
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'durations': durations,
+        'days': days
+    }), 200
+
 @appointments_bp.route('/admin/stats/', methods=['GET'])
+@query_budget(1)
 def get_appointment_stats():
     # Get date range from query parameters
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
     
-    query = Appointment.query
-    
-    if start_date:
-        query = query.filter(Appointment.date >= datetime.strptime(start_date, '%Y-%m-%d').date())
-    if end_date:
-        query = query.filter(Appointment.date <= datetime.strptime(end_date, '%Y-%m-%d').date())
+    # Aggregate the daily rollup instead of scanning the appointments table
+    query = db.session.query(
+        DailyAppointmentStats.status,
+        db.func.sum(DailyAppointmentStats.count),
+        db.func.sum(DailyAppointmentStats.revenue),
+        db.func.sum(DailyAppointmentStats.rating_sum),
+        db.func.sum(DailyAppointmentStats.rating_count)
+    ).group_by(DailyAppointmentStats.status)
     
-    # Get total appointments
-    total_appointments = query.count()
+    try:
+        if start_date:
+            query = query.filter(DailyAppointmentStats.date >= datetime.strptime(start_date, '%Y-%m-%d').date())
+        if end_date:
+            query = query.filter(DailyAppointmentStats.date <= datetime.strptime(end_date, '%Y-%m-%d').date())
+    except ValueError:
+        return jsonify({'message': 'Invalid date format. Use YYYY-MM-DD'}), 400
     
-    # Get appointments by status
-    status_counts = {}
-    for status in ['pending', 'confirmed', 'completed', 'cancelled']:
-        status_counts[status] = query.filter_by(status=status).count()
+    total_appointments = 0
+    status_counts = {status: 0 for status in ['pending', 'confirmed', 'completed', 'cancelled']}
+    total_revenue = 0
+    rating_sum = 0
+    rating_count = 0
     
-    # Get total revenue
-    total_revenue = db.session.query(db.func.sum(Appointment.price)).filter(
-        Appointment.status == 'completed'
-    ).scalar() or 0
+    for status, count, revenue, status_rating_sum, status_rating_count in query.all():
+        total_appointments += count or 0
+        if status in status_counts:
+            status_counts[status] = count or 0
+        # Revenue only counts completed appointments
+        if status == 'completed':
+            total_revenue = revenue or 0
+        rating_sum += status_rating_sum or 0
+        rating_count += status_rating_count or 0
     
-    # Get average rating
-    avg_rating = db.session.query(db.func.avg(Appointment.client_rating)).filter(
-        Appointment.client_rating.isnot(None)
-    ).scalar() or 0
+    avg_rating = rating_sum / rating_count if rating_count else 0
     
     return jsonify({
-        'total_appointments': total_appointments,
-        'status_counts': status_counts,
+        'total_appointments': int(total_appointments),
+        'status_counts': {status: int(count) for status, count in status_counts.items()},
         'total_revenue': float(total_revenue),
         'average_rating': float(avg_rating)
     }), 200
 
 @appointments_bp.route('/business-hours/', methods=['GET'])
+@conditional(BUSINESS_HOURS)
+@query_budget(2)
 def get_business_hours():
-    business_hours = BusinessHours.query.all()
+    business_hours = reference_cache.get(BUSINESS_HOURS).values()
     return jsonify({'business_hours': [hours.to_dict() for hours in business_hours]}), 200
 
 @appointments_bp.route('/business-hours/', methods=['POST'])
@@ -436,6 +699,7 @@ def set_business_hours():
             
             db.session.add(hours)
         
+        reference_cache.bump(BUSINESS_HOURS)
         db.session.commit()
         
         return jsonify({'message': 'Business hours updated successfully'}), 200
@@ -444,8 +708,10 @@ def set_business_hours():
         return jsonify({'message': 'Invalid time format'}), 400
 
 @appointments_bp.route('/blocked-dates/', methods=['GET'])
+@conditional(BLOCKED_DATES)
+@query_budget(2)
 def get_blocked_dates():
-    blocked_dates = BlockedDate.query.order_by(BlockedDate.date).all()
+    blocked_dates = reference_cache.get(BLOCKED_DATES).values()
     return jsonify({'blocked_dates': [date.to_dict() for date in blocked_dates]}), 200
 
 @appointments_bp.route('/blocked-dates/', methods=['POST'])
@@ -468,6 +734,7 @@ def add_blocked_date():
         )
         
         db.session.add(new_blocked_date)
+        reference_cache.bump(BLOCKED_DATES)
         db.session.commit()
         
         return jsonify({'blocked_date': new_blocked_date.to_dict()}), 201
@@ -483,6 +750,7 @@ def remove_blocked_date(blocked_date_id):
         return jsonify({'message': 'Blocked date not found'}), 404
     
     db.session.delete(blocked_date)
+    reference_cache.bump(BLOCKED_DATES)
     db.session.commit()
     
     return jsonify({'message': 'Blocked date removed successfully'}), 200
@@ -512,6 +780,7 @@ def setup_default_business_hours():
                 close_time=time(0, 0)
             ))
         
+        reference_cache.bump(BUSINESS_HOURS)
         db.session.commit()
         
         return jsonify({'message': 'Default business hours set successfully'}), 200
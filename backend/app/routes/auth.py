@@ -1,12 +1,16 @@
 from functools import wraps
 import logging
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, verify_jwt_in_request
-from werkzeug.security import check_password_hash, generate_password_hash
+from flask_jwt_extended import create_access_token, jwt_required, get_jwt, get_jwt_identity, verify_jwt_in_request
 from ..models import User
+from ..utils.identity_cache import MISSING, identity_cache
+from ..utils.passwords import PasswordHashBusy, password_hasher
+from ..utils.rate_limit import login_account_limiter, login_ip_limiter, login_username_limiter
+from ..utils.token_revocation import token_revocation
 from .. import db
 
 auth_bp = Blueprint('auth', __name__)
+logger = logging.getLogger(__name__)
 
 def admin_required(f):
     @wraps(f)
@@ -16,33 +20,28 @@ def admin_required(f):
             verify_jwt_in_request()
             
             current_user_id = get_jwt_identity()
-            print(f"Admin check for user ID: {current_user_id}")
+            logger.debug("Admin check for user ID: %s", current_user_id)
             
             if not current_user_id:
                 return jsonify({'error': 'Missing or invalid JWT token'}), 401
             
-            # Опитваме се да намерим потребителя, като първо преобразуваме ID-то в int, ако е string
-            try:
-                if isinstance(current_user_id, str) and current_user_id.isdigit():
-                    user_id = int(current_user_id)
-                else:
-                    user_id = current_user_id
-                
-                user = User.query.get(user_id)
-            except Exception as e:
-                print(f"Error converting user ID: {str(e)}")
-                user = User.query.get(current_user_id)
-                
-            if not user:
+            # Токенът носи ролята, с която е издаден (по-стари токени без роля се проверяват само чрез кеша)
+            if get_jwt().get('role', 'admin') != 'admin':
+                return jsonify({'error': 'Admin privileges required'}), 403
+            
+            # Кешът потвърждава, че потребителят още съществува и е администратор, без заявка към базата
+            role = identity_cache.get_role(int(current_user_id))
+            
+            if role is MISSING:
                 return jsonify({'error': 'User not found'}), 404
                 
-            if user.username != 'admin':
+            if role != 'admin':
                 return jsonify({'error': 'Admin privileges required'}), 403
             
-            print(f"Admin privileges confirmed for user: {user.username}")
+            logger.debug("Admin privileges confirmed for user ID: %s", current_user_id)
             return f(*args, **kwargs)
         except Exception as e:
-            logging.error(f"Error in admin_required: {str(e)}")
+            logger.error("Error in admin_required: %s", e)
             return jsonify({'error': 'Authentication failed'}), 401
             
     return decorated_function
@@ -54,18 +53,50 @@ def login():
     if not data or not data.get('username') or not data.get('password'):
         return jsonify({'error': 'Missing username or password'}), 400
     
-    user = User.query.filter_by(username=data['username']).first()
+    # Ограничение на опитите за вход по IP адрес и по потребителско име
+    # (неуспешните опити се броят за двойката клиент + потребител, за да не може
+    # един клиент да заключи акаунта за всички останали, и с по-висок праг за
+    # потребителското име от всички клиенти - срещу атака от много IP адреси)
+    username = data['username']
+    failure_key = (request.remote_addr, username)
+    retry_after = max(login_ip_limiter.retry_after(request.remote_addr),
+                      login_username_limiter.retry_after(failure_key),
+                      login_account_limiter.retry_after(username))
+    if retry_after:
+        return jsonify({'error': 'Too many login attempts, please try again later'}), 429, {'Retry-After': str(retry_after)}
+    login_ip_limiter.hit(request.remote_addr)
+    
+    user = User.query.filter_by(username=username).first()
+    
+    try:
+        # Hashing runs on the password hash pool, not in this worker
+        valid = password_hasher.verify(user.password_hash if user else None, data['password'])
+    except PasswordHashBusy:
+        return jsonify({'error': 'Server busy, please try again'}), 503, {'Retry-After': '1'}
     
-    if not user or not check_password_hash(user.password_hash, data['password']):
+    if not valid:
+        login_username_limiter.hit(failure_key)
+        login_account_limiter.hit(username)
         return jsonify({'error': 'Invalid username or password'}), 401
     
+    login_username_limiter.reset(failure_key)
+    
+    # Hashes made with older parameters are upgraded while we have the password
+    if password_hasher.needs_rehash(user.password_hash):
+        try:
+            user.password_hash = password_hasher.hash(data['password'])
+            db.session.commit()
+        except PasswordHashBusy:
+            pass
+    
     # Create the token with the user's ID as string to avoid "Subject must be a string" error
-    access_token = create_access_token(identity=str(user.id))
+    # The role claim lets admin_required authorize without loading the user
+    access_token = create_access_token(identity=str(user.id), additional_claims={'role': user.role})
     
     # Return both the token and user info
     return jsonify({
         'access_token': access_token,
-        'is_admin': user.username == 'admin',
+        'is_admin': user.role == 'admin',
         'user': user.to_dict()
     }), 200
 
@@ -84,10 +115,10 @@ def get_current_user():
         
         return jsonify({
             'user': user.to_dict(),
-            'is_admin': user.username == 'admin'
+            'is_admin': user.role == 'admin'
         }), 200
     except Exception as e:
-        logging.error(f"Error in get_current_user: {str(e)}")
+        logger.error("Error in get_current_user: %s", e)
         return jsonify({'error': 'Authentication failed'}), 401
 
 @auth_bp.route('/change-password', methods=['PUT'])
@@ -104,10 +135,31 @@ def change_password():
     if not user:
         return jsonify({'error': 'User not found'}), 404
     
-    if not check_password_hash(user.password_hash, data['old_password']):
-        return jsonify({'error': 'Invalid old password'}), 401
+    retry_after = login_username_limiter.retry_after((request.remote_addr, user.username))
+    if retry_after:
+        return jsonify({'error': 'Too many attempts, please try again later'}), 429, {'Retry-After': str(retry_after)}
     
-    user.password_hash = generate_password_hash(data['new_password'])
+    try:
+        if not password_hasher.verify(user.password_hash, data['old_password']):
+            login_username_limiter.hit((request.remote_addr, user.username))
+            return jsonify({'error': 'Invalid old password'}), 401
+        
+        user.password_hash = password_hasher.hash(data['new_password'])
+    except PasswordHashBusy:
+        return jsonify({'error': 'Server busy, please try again'}), 503, {'Retry-After': '1'}
+    # Всички издадени досега токени (и на други устройства) стават невалидни
+    token_revocation.revoke_user_tokens(user)
     db.session.commit()
+    token_revocation.user_tokens_revoked(user)
+    identity_cache.invalidate(user.id)
+    
+    # A fresh token, so this session stays logged in
+    access_token = create_access_token(identity=str(user.id), additional_claims={'role': user.role})
     
-    return jsonify({'message': 'Password changed successfully'}), 200 
\ No newline at end of file
+    return jsonify({'message': 'Password changed successfully', 'access_token': access_token}), 200
+
+@auth_bp.route('/logout', methods=['POST'])
+@jwt_required()
+def logout():
+    token_revocation.revoke(get_jwt())
+    return jsonify({'message': 'Logged out successfully'}), 200 
\ No newline at end of file
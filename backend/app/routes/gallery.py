@@ -1,20 +1,75 @@
+import logging
 import os
-from flask import Blueprint, request, jsonify, current_app
+from datetime import datetime
+from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from werkzeug.utils import secure_filename
+from sqlalchemy import tuple_
+from sqlalchemy.orm import load_only
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
 from ..models import GalleryImage
+from ..utils.http_cache import conditional
+from ..utils.gallery_storage import release, shared_variants, store, upload_folder
+from ..utils.image_variants import image_variants
+from ..utils.pagination import decode_cursor, encode_cursor, page_size
+from ..utils.query_budget import query_budget
+from ..utils.reference_cache import GALLERY, reference_cache
+from ..utils.uploads import image_upload
 from .. import db
 
 gallery_bp = Blueprint('gallery', __name__)
+logger = logging.getLogger(__name__)
 
 def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in {'png', 'jpg', 'jpeg', 'gif'}
 
 @gallery_bp.route('/', methods=['GET'])
+@conditional(GALLERY)
+@query_budget(1)
 def get_gallery_images():
-    images = GalleryImage.query.order_by(GalleryImage.created_at.desc()).all()
-    return jsonify({'images': [image.to_dict() for image in images]}), 200
+    """List gallery images, newest first.
+
+    ``limit`` and/or ``cursor`` switch to keyset pagination on
+    (created_at, id) with a ``next_cursor`` for the following page, for
+    infinite scrolling. ``lite=true`` returns only id and thumbnail URL.
+    Without any of them the full list is returned as before.
+    """
+    query = GalleryImage.query
+    lite = request.args.get('lite', '').lower() in ('1', 'true', 'yes')
+    if lite:
+        query = query.options(load_only(
+            GalleryImage.id, GalleryImage.file_path, GalleryImage.variants, GalleryImage.created_at
+        ))
+    
+    paginate = 'limit' in request.args or 'cursor' in request.args
+    if paginate:
+        try:
+            limit = page_size(request.args.get('limit'), 'GALLERY_PAGE_SIZE', 'GALLERY_MAX_PAGE_SIZE')
+            cursor = request.args.get('cursor')
+            if cursor:
+                last_created_at, last_id = decode_cursor(cursor, 2)
+                query = query.filter(tuple_(GalleryImage.created_at, GalleryImage.id) < tuple_(
+                    datetime.fromisoformat(last_created_at), int(last_id)
+                ))
+        except (ValueError, TypeError):
+            return jsonify({'message': 'Invalid limit or cursor'}), 400
+    
+    query = query.order_by(GalleryImage.created_at.desc(), GalleryImage.id.desc())
+    
+    next_cursor = None
+    if paginate:
+        # Един допълнителен ред показва дали има следваща страница
+        images = query.limit(limit + 1).all()
+        if len(images) > limit:
+            images = images[:limit]
+            next_cursor = encode_cursor([images[-1].created_at.isoformat(), images[-1].id])
+    else:
+        images = query.all()
+    
+    result = [image.to_thumbnail_dict() if lite else image.to_dict() for image in images]
+    if paginate:
+        return jsonify({'images': result, 'next_cursor': next_cursor}), 200
+    return jsonify({'images': result}), 200
 
 @gallery_bp.route('/<int:image_id>', methods=['GET'])
 def get_gallery_image(image_id):
@@ -31,132 +86,127 @@ def get_gallery_image_alt(image_id):
     return get_gallery_image(image_id)
 
 @gallery_bp.route('/', methods=['POST'])
+@image_upload
 def upload_gallery_image():
     try:
-        current_app.logger.info("Starting image upload...")
-        
-        # Print all form data for debugging
-        for key, value in request.form.items():
-            current_app.logger.info(f"Form field {key}: {value}")
-        
-        # Print all files for debugging
-        for key, file in request.files.items():
-            current_app.logger.info(f"Received file with key {key}: {file.filename}")
+        logger.debug("Starting image upload...")
         
         # Проверка дали директорията съществува и дали имаме права за запис
-        static_folder = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static')
-        upload_folder = os.path.join(static_folder, 'uploads')
+        folder = upload_folder()
         
-        # Гарантираме, че директориите съществуват
-        os.makedirs(static_folder, exist_ok=True)
-        os.makedirs(upload_folder, exist_ok=True)
-        current_app.logger.info(f"Upload directory path: {upload_folder}")
+        # Гарантираме, че директорията съществува
+        os.makedirs(folder, exist_ok=True)
+        logger.debug("Upload directory path: %s", folder)
         
-        if not os.access(upload_folder, os.W_OK):
-            current_app.logger.error(f"No write permission to directory: {upload_folder}")
+        if not os.access(folder, os.W_OK):
+            logger.error("No write permission to directory: %s", folder)
             return jsonify({'message': 'Server configuration error: No write permission to upload directory'}), 500
             
         # Проверка дали е предоставен файл
         if 'image' not in request.files:
-            current_app.logger.error("No 'image' field in request.files")
-            current_app.logger.error(f"Available fields: {list(request.files.keys())}")
-            current_app.logger.error(f"Request method: {request.method}")
-            current_app.logger.error(f"Content type: {request.content_type}")
-            current_app.logger.error(f"Request data: {request.data}")
+            logger.warning("No 'image' field in request.files", extra={
+                'fields': list(request.files.keys()), 'content_type': request.content_type
+            })
             return jsonify({'message': 'No image provided'}), 400
         
         file = request.files['image']
-        current_app.logger.info(f"Received file: {file.filename}, type: {file.content_type}")
+        logger.info("Received file: %s, type: %s", file.filename, file.content_type)
         
         if file.filename == '':
             return jsonify({'message': 'No image selected'}), 400
         
         if file and allowed_file(file.filename):
-            # Генерираме уникално име на файла, за да избегнем колизии
-            import uuid
-            filename = f"{uuid.uuid4().hex}_{secure_filename(file.filename)}"
-            file_path = os.path.join(upload_folder, filename)
-            current_app.logger.info(f"Saving file to: {file_path}")
-            
+            # Името на файла е хешът на съдържанието: еднакви снимки се пазят само веднъж
             try:
-                file.save(file_path)
-                current_app.logger.info(f"File saved successfully to: {file_path}")
+                content_hash, file_url = store(file.stream, file.filename.rsplit('.', 1)[1])
+                logger.info("File saved successfully as: %s", file_url)
             except Exception as e:
-                current_app.logger.error(f"Error saving file: {str(e)}")
+                logger.exception("Error saving file")
                 return jsonify({'message': f'Error saving file: {str(e)}'}), 500
             
             gallery_image = GalleryImage(
                 title=request.form.get('title', ''),
-                file_path=f'/static/uploads/{filename}'
+                file_path=file_url,
+                content_hash=content_hash,
+                variants=shared_variants(content_hash)
             )
             
             db.session.add(gallery_image)
+            reference_cache.bump(GALLERY)
             db.session.commit()
-            current_app.logger.info(f"Gallery image record created: {gallery_image.id}")
+            logger.info("Gallery image record created: %s", gallery_image.id)
+            
+            # Умалените копия и WebP версиите се генерират във фонов режим
+            if not gallery_image.variants:
+                image_variants.schedule(gallery_image)
             
             return jsonify({'image': gallery_image.to_dict()}), 201
         
         return jsonify({'message': 'Invalid file type'}), 400
+    except (RequestEntityTooLarge, UnsupportedMediaType) as e:
+        # Rejected while the upload was streaming in (size limit or not an image)
+        logger.warning("Upload rejected: %s", e.description)
+        return jsonify({'message': e.description}), e.code
     except Exception as e:
-        current_app.logger.error(f"Unhandled exception in upload_gallery_image: {str(e)}")
+        logger.exception("Unhandled exception in upload_gallery_image")
         return jsonify({'message': f'Server error: {str(e)}'}), 500
 
 @gallery_bp.route('/<int:image_id>', methods=['PUT'])
 # Временно премахнато: @jwt_required()
+@image_upload
 def update_gallery_image(image_id):
     try:
-        current_app.logger.info(f"Опит за актуализиране на изображение с ID: {image_id}")
+        logger.info("Опит за актуализиране на изображение с ID: %s", image_id)
         image = GalleryImage.query.get(image_id)
         
         if not image:
-            current_app.logger.error(f"Изображение с ID {image_id} не е намерено")
+            logger.info("Изображение с ID %s не е намерено", image_id)
             return jsonify({'message': 'Image not found'}), 404
         
-        current_app.logger.info(f"Form data: {request.form}")
-        current_app.logger.info(f"Files: {request.files}")
-        
         if 'title' in request.form:
             image.title = request.form['title']
-            current_app.logger.info(f"Новото заглавие: {image.title}")
+            logger.info("Новото заглавие: %s", image.title)
         
+        old_file = None
         if 'image' in request.files:
             file = request.files['image']
             if file and allowed_file(file.filename):
-                # Remove old image if exists
-                if image.file_path:
-                    old_file_path = os.path.join(current_app.root_path, image.file_path.lstrip('/'))
-                    if os.path.exists(old_file_path):
-                        os.remove(old_file_path)
-                        current_app.logger.info(f"Изтрито старо изображение: {old_file_path}")
-                
-                # Генерираме уникално име на файла, за да избегнем колизии
-                import uuid
-                filename = f"{uuid.uuid4().hex}_{secure_filename(file.filename)}"
-                
-                # Проверка дали директорията за качване съществува
-                static_folder = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static')
-                upload_folder = os.path.join(static_folder, 'uploads')
-                os.makedirs(upload_folder, exist_ok=True)
-                
-                file_path = os.path.join(upload_folder, filename)
-                current_app.logger.info(f"Запазване на файл в: {file_path}")
+                content_hash, file_url = store(file.stream, file.filename.rsplit('.', 1)[1])
+                logger.info("Нов файл: %s", file_url)
                 
-                file.save(file_path)
-                image.file_path = f'/static/uploads/{filename}'
-                current_app.logger.info(f"Нов път към файла: {image.file_path}")
-        
+                if file_url != image.file_path:
+                    # Старият файл се изтрива след commit, ако никое друго изображение не го използва
+                    variants = shared_variants(content_hash)
+                    old_file = (image.content_hash, image.file_path, image.variants)
+                    image.file_path = file_url
+                    image.content_hash = content_hash
+                    image.variants = variants
+                    logger.info("Нов път към файла: %s", image.file_path)
+        
+        reference_cache.bump(GALLERY)
         db.session.commit()
-        current_app.logger.info(f"Изображение с ID {image_id} успешно актуализирано")
+        logger.info("Изображение с ID %s успешно актуализирано", image_id)
+        
+        if old_file:
+            if release(*old_file):
+                logger.info("Изтрито старо изображение: %s", old_file[1])
+            if not image.variants:
+                image_variants.schedule(image)
         
         return jsonify({'image': image.to_dict()}), 200
+    except (RequestEntityTooLarge, UnsupportedMediaType) as e:
+        db.session.rollback()
+        logger.warning("Отхвърлен файл: %s", e.description)
+        return jsonify({'message': e.description}), e.code
     except Exception as e:
         db.session.rollback()
         error_msg = f"Грешка при актуализиране на изображение: {str(e)}"
-        current_app.logger.error(error_msg)
+        logger.exception(error_msg)
         return jsonify({'message': error_msg}), 500
 
 # Алтернативен маршрут с наклонена черта в края
 @gallery_bp.route('/<int:image_id>/', methods=['PUT'])
+@image_upload
 def update_gallery_image_alt(image_id):
     return update_gallery_image(image_id)
 
@@ -164,29 +214,29 @@ def update_gallery_image_alt(image_id):
 # Временно премахнато: @jwt_required()
 def delete_gallery_image(image_id):
     try:
-        current_app.logger.info(f"Опит за изтриване на изображение с ID: {image_id}")
+        logger.info("Опит за изтриване на изображение с ID: %s", image_id)
         image = GalleryImage.query.get(image_id)
         
         if not image:
-            current_app.logger.error(f"Изображение с ID {image_id} не е намерено")
+            logger.info("Изображение с ID %s не е намерено", image_id)
             return jsonify({'message': 'Image not found'}), 404
         
-        # Remove image file
-        if image.file_path:
-            file_path = os.path.join(current_app.root_path, image.file_path.lstrip('/'))
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                current_app.logger.info(f"Изтрит файл: {file_path}")
+        stored_file = (image.content_hash, image.file_path, image.variants)
         
         db.session.delete(image)
+        reference_cache.bump(GALLERY)
         db.session.commit()
-        current_app.logger.info(f"Изображение с ID {image_id} успешно изтрито")
+        
+        # Remove the file once no other image shares its content
+        if stored_file[1] and release(*stored_file):
+            logger.info("Изтрит файл: %s", stored_file[1])
+        logger.info("Изображение с ID %s успешно изтрито", image_id)
         
         return jsonify({'message': 'Image deleted successfully'}), 200
     except Exception as e:
         db.session.rollback()
         error_msg = f"Грешка при изтриване на изображение: {str(e)}"
-        current_app.logger.error(error_msg)
+        logger.exception(error_msg)
         return jsonify({'message': error_msg}), 500
 
 # Алтернативен маршрут с наклонена черта в края
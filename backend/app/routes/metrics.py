@@ -0,0 +1,26 @@
+import hmac
+
+from flask import Blueprint, Response, current_app, jsonify, request
+
+from ..utils import structured_log
+from ..utils.metrics import pool_gauges, request_metrics
+from .. import db
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus scrape endpoint: request metrics of this worker and the DB pool state"""
+    # С METRICS_TOKEN достъпът изисква 'Authorization: Bearer <token>' (bearer_token в Prometheus);
+    # без токен endpoint-ът е достъпен само в DEBUG режим
+    token = current_app.config.get('METRICS_TOKEN')
+    if not token:
+        if not current_app.debug:
+            return jsonify({'error': 'Not found'}), 404
+    elif not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    extra = pool_gauges(db.engine)
+    extra.append(('app_log_records_dropped_total', 'counter',
+                  'Log records dropped because the log queue was full.', structured_log.dropped_records()))
+    return Response(request_metrics.render(extra), mimetype='text/plain; version=0.0.4; charset=utf-8')
@@ -2,10 +2,14 @@ from flask import Blueprint, request, jsonify
 from app import db
 from app.models.review import Review
 from app.routes.auth import admin_required
+from app.utils.http_cache import conditional
+from app.utils.query_budget import query_budget
+from app.utils.reference_cache import REVIEWS, reference_cache
 from flask_jwt_extended import jwt_required, get_jwt_identity
 import logging
 
 reviews_bp = Blueprint('reviews', __name__)
+logger = logging.getLogger(__name__)
 
 @reviews_bp.route('/', methods=['POST'])
 def create_review():
@@ -24,11 +28,14 @@ def create_review():
     )
     
     db.session.add(review)
+    reference_cache.bump(REVIEWS)
     db.session.commit()
     
     return jsonify({'message': 'Review submitted successfully', 'review': review.to_dict()}), 201
 
 @reviews_bp.route('/', methods=['GET'])
+@conditional(REVIEWS)
+@query_budget(1)
 def get_reviews():
     # За публичната страница показваме само одобрените отзиви
     reviews = Review.query.filter_by(is_approved=True).order_by(Review.created_at.desc()).all()
@@ -36,13 +43,14 @@ def get_reviews():
 
 @reviews_bp.route('/admin', methods=['GET'])
 @admin_required
+@query_budget(1)
 def get_admin_reviews():
     try:
         # За админ панела показваме всички отзиви
         reviews = Review.query.order_by(Review.created_at.desc()).all()
         return jsonify({'reviews': [review.to_dict() for review in reviews]})
     except Exception as e:
-        print(f"Error in get_admin_reviews: {str(e)}")
+        logger.exception("Error in get_admin_reviews")
         return jsonify({'error': str(e)}), 500
 
 @reviews_bp.route('/admin/<int:review_id>/approve', methods=['POST'])
@@ -51,10 +59,11 @@ def approve_review(review_id):
     try:
         review = Review.query.get_or_404(review_id)
         review.is_approved = True
+        reference_cache.bump(REVIEWS)
         db.session.commit()
         return jsonify({'message': 'Review approved successfully', 'review': review.to_dict()})
     except Exception as e:
-        print(f"Error in approve_review: {str(e)}")
+        logger.exception("Error in approve_review")
         return jsonify({'error': str(e)}), 500
 
 @reviews_bp.route('/admin/<int:review_id>', methods=['DELETE'])
@@ -63,8 +72,9 @@ def delete_review(review_id):
     try:
         review = Review.query.get_or_404(review_id)
         db.session.delete(review)
+        reference_cache.bump(REVIEWS)
         db.session.commit()
         return jsonify({'message': 'Review deleted successfully'})
     except Exception as e:
-        print(f"Error in delete_review: {str(e)}")
+        logger.exception("Error in delete_review")
         return jsonify({'error': str(e)}), 500 
\ No newline at end of file
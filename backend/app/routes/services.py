@@ -1,6 +1,9 @@
 from flask import Blueprint, request, jsonify
 from flask_cors import cross_origin
 from ..models import Service, Appointment
+from ..utils.http_cache import conditional
+from ..utils.query_budget import query_budget
+from ..utils.reference_cache import SERVICES, reference_cache
 from .. import db
 
 services_bp = Blueprint('services', __name__)
@@ -8,11 +11,13 @@ services_bp = Blueprint('services', __name__)
 @services_bp.route('/', methods=['GET', 'OPTIONS'])
 @services_bp.route('', methods=['GET', 'OPTIONS'])
 @cross_origin()
+@conditional(SERVICES)
+@query_budget(2)
 def get_services():
     if request.method == 'OPTIONS':
         return '', 200
         
-    services = Service.query.all()
+    services = reference_cache.get(SERVICES).values()
     return jsonify({'services': [service.to_dict() for service in services]}), 200
 
 @services_bp.route('/<int:service_id>/', methods=['GET', 'OPTIONS'])
@@ -22,7 +27,7 @@ def get_service(service_id):
     if request.method == 'OPTIONS':
         return '', 200
         
-    service = Service.query.get(service_id)
+    service = reference_cache.get(SERVICES).get(service_id)
     
     if not service:
         return jsonify({'message': 'Service not found'}), 404
@@ -49,6 +54,7 @@ def create_service():
     )
     
     db.session.add(service)
+    reference_cache.bump(SERVICES)
     db.session.commit()
     
     return jsonify({'service': service.to_dict()}), 201
@@ -79,6 +85,7 @@ def update_service(service_id):
     if 'price' in data:
         service.price = float(data['price'])
     
+    reference_cache.bump(SERVICES)
     db.session.commit()
     
     return jsonify({'service': service.to_dict()}), 200
@@ -95,16 +102,17 @@ def delete_service(service_id):
     if not service:
         return jsonify({'message': 'Service not found'}), 404
     
-    # Check for existing appointments
-    existing_appointments = Appointment.query.filter_by(service_id=service_id).all()
-    if existing_appointments:
+    # Check for existing appointments (served by ix_appointments_service_id)
+    appointments_count = Appointment.query.filter_by(service_id=service_id).count()
+    if appointments_count:
         return jsonify({
             'message': 'Не може да изтриете тази услуга, защото има резервации, свързани с нея.',
-            'appointments_count': len(existing_appointments)
+            'appointments_count': appointments_count
         }), 400
     
     try:
         db.session.delete(service)
+        reference_cache.bump(SERVICES)
         db.session.commit()
         return jsonify({'message': 'Услугата е изтрита успешно'}), 200
     except Exception as e:
@@ -0,0 +1,45 @@
+import mimetypes
+import os
+from urllib.parse import quote
+
+from flask import Blueprint, Response, abort, current_app, request
+from werkzeug.security import safe_join
+from werkzeug.utils import send_file
+
+uploads_bp = Blueprint('uploads', __name__)
+
+# Upload URLs never change content: new content gets a new name (its hash)
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+@uploads_bp.route('/<path:filename>', methods=['GET'])
+def serve_upload(filename):
+    """Serve an uploaded file, or hand the transfer over to the front-end web server.
+
+    UPLOAD_SERVE_MODE:
+    - 'app': the worker sends the file (gunicorn uses sendfile() for whole
+      files; Range and If-None-Match are answered with 206 / 304)
+    - 'x-accel': nginx serves it from the internal UPLOAD_ACCEL_PREFIX location
+    - 'x-sendfile': Apache mod_xsendfile / lighttpd serve the X-Sendfile path
+    With the last two the worker only checks the path and the web server
+    does the transfer, including Range requests.
+    """
+    path = safe_join(current_app.config['UPLOAD_FOLDER'], filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    mode = current_app.config.get('UPLOAD_SERVE_MODE', 'app')
+    if mode == 'x-accel':
+        response = Response(mimetype=mimetypes.guess_type(path)[0] or 'application/octet-stream')
+        response.headers['X-Accel-Redirect'] = current_app.config['UPLOAD_ACCEL_PREFIX'].rstrip('/') + '/' + quote(filename)
+    else:
+        x_sendfile = mode == 'x-sendfile'
+        # With X-Sendfile the body is empty, so Range must be left to the web server
+        response = send_file(
+            path, request.environ, max_age=IMMUTABLE_MAX_AGE, conditional=not x_sendfile,
+            use_x_sendfile=x_sendfile, response_class=current_app.response_class
+        )
+
+    response.cache_control.public = True
+    response.cache_control.max_age = IMMUTABLE_MAX_AGE
+    response.cache_control.immutable = True
+    return response
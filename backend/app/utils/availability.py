@@ -0,0 +1,98 @@
+import threading
+import time as _time
+from collections import OrderedDict
+from datetime import timedelta
+
+from .reference_cache import BLOCKED_DATES, BUSINESS_HOURS, reference_cache
+from .scheduling import load_day_schedules, to_minutes
+
+
+class AvailabilityIndex:
+    """In-process per-date cache of DaySchedule bitmaps used by the slot lookups.
+
+    Each date is loaded from the database once and then kept in sync by the
+    appointment write paths. Entries expire after ``ttl`` seconds so that
+    bookings made through other worker processes are eventually picked up,
+    and immediately when the business hours or blocked dates generation in
+    the reference cache moves on.
+    """
+
+    def __init__(self, ttl=60, max_days=366):
+        self.ttl = ttl
+        self.max_days = max_days
+        self._days = OrderedDict()
+        self._built_at = {}
+        self._reference_version = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.ttl = app.config.get('AVAILABILITY_INDEX_TTL', self.ttl)
+        self.max_days = app.config.get('AVAILABILITY_INDEX_MAX_DAYS', self.max_days)
+
+    def get_day(self, date):
+        return self.get_range(date, date)[0]
+
+    def get_range(self, start_date, end_date):
+        """Return the DaySchedule for every date in [start_date, end_date].
+
+        Dates that are missing or stale are loaded together with a single
+        appointments query, however many days the range covers.
+        """
+        dates = [start_date + timedelta(days=n) for n in range((end_date - start_date).days + 1)]
+        version = self._current_reference_version()
+        now = _time.monotonic()
+        found = {}
+        with self._lock:
+            for date in dates:
+                day = self._days.get(date)
+                if day is not None and now - self._built_at[date] < self.ttl \
+                        and self._reference_version[date] == version:
+                    self._days.move_to_end(date)
+                    found[date] = day
+
+        missing = [date for date in dates if date not in found]
+        if missing:
+            for day in load_day_schedules(missing[0], missing[-1]):
+                if day.date not in found:
+                    found[day.date] = day
+                    self._store(day, version)
+
+        return [found[date] for date in dates]
+
+    def _current_reference_version(self):
+        generations = reference_cache.generations()
+        return generations.get(BUSINESS_HOURS, 0), generations.get(BLOCKED_DATES, 0)
+
+    def _store(self, day, version):
+        with self._lock:
+            self._days[day.date] = day
+            self._built_at[day.date] = _time.monotonic()
+            self._reference_version[day.date] = version
+            self._days.move_to_end(day.date)
+            while len(self._days) > self.max_days:
+                date, _ = self._days.popitem(last=False)
+                self._built_at.pop(date, None)
+                self._reference_version.pop(date, None)
+
+    def add_appointment(self, appointment):
+        with self._lock:
+            day = self._days.get(appointment.date)
+            if day is not None:
+                day.add(appointment.id, to_minutes(appointment.start_time), to_minutes(appointment.end_time))
+
+    def remove_appointment(self, appointment_id, date):
+        with self._lock:
+            day = self._days.get(date)
+            if day is not None:
+                day.remove(appointment_id)
+
+    def invalidate(self, dates):
+        """Drop cached days, e.g. after rows were inserted without going through the ORM."""
+        with self._lock:
+            for date in dates:
+                self._days.pop(date, None)
+                self._built_at.pop(date, None)
+                self._reference_version.pop(date, None)
+
+
+availability_index = AvailabilityIndex()
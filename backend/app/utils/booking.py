@@ -0,0 +1,82 @@
+import random
+import threading
+import time as _time
+from contextlib import contextmanager
+
+from flask import current_app
+from sqlalchemy import text
+
+from .. import db
+
+# First key of the two-int advisory lock, so booking locks can't collide with
+# advisory locks taken by anything else on the same database
+ADVISORY_LOCK_NAMESPACE = 0x424B
+
+_LOCAL_STRIPES = 64
+_local_locks = [threading.Lock() for _ in range(_LOCAL_STRIPES)]
+
+
+class BookingBusy(Exception):
+    """The per-day booking lock could not be acquired within the retry budget."""
+
+
+def _backoff(attempt):
+    base = current_app.config.get('BOOKING_LOCK_BACKOFF', 0.005)
+    cap = current_app.config.get('BOOKING_LOCK_BACKOFF_MAX', 0.1)
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def _acquire_local(stripes):
+    timeout = current_app.config.get('BOOKING_LOCK_TIMEOUT', 5)
+    held = []
+    for stripe in stripes:
+        lock = _local_locks[stripe]
+        if not lock.acquire(timeout=timeout):
+            for held_lock in reversed(held):
+                held_lock.release()
+            raise BookingBusy()
+        held.append(lock)
+    return held
+
+
+def _acquire_advisory(dates, attempts):
+    # try-lock instead of a blocking lock with lock_timeout: a failed try
+    # doesn't abort the transaction, so pending changes survive a retry
+    statement = text('SELECT pg_try_advisory_xact_lock(:namespace, :key)')
+    with db.session.no_autoflush:
+        for date in dates:
+            for attempt in range(attempts):
+                params = {'namespace': ADVISORY_LOCK_NAMESPACE, 'key': date.toordinal()}
+                if db.session.execute(statement, params).scalar():
+                    break
+                _time.sleep(_backoff(attempt))
+            else:
+                raise BookingBusy()
+
+
+@contextmanager
+def booking_lock(*dates):
+    """Serialize booking writes for the given dates, and only those dates.
+
+    Bookings on different days don't wait for each other. Within a process a
+    striped lock keeps threads apart; on PostgreSQL a transaction-level
+    advisory lock per date does the same across worker processes and is
+    released by the commit or rollback that ends the transaction. The
+    availability check, the insert/update and the commit must all happen
+    inside the block.
+    """
+    dates = sorted(set(d for d in dates if d is not None))
+    held = _acquire_local(sorted(set(d.toordinal() % _LOCAL_STRIPES for d in dates)))
+    try:
+        if db.session.get_bind().dialect.name == 'postgresql':
+            _acquire_advisory(dates, current_app.config.get('BOOKING_LOCK_ATTEMPTS', 40))
+        yield
+    finally:
+        for lock in reversed(held):
+            lock.release()
+
+
+def is_overlap_violation(error):
+    """True if an IntegrityError comes from the optional appointments_no_overlap constraint."""
+    orig = getattr(error, 'orig', None)
+    return getattr(orig, 'pgcode', None) == '23P01' or 'appointments_no_overlap' in str(orig)
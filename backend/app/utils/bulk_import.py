@@ -0,0 +1,191 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from .. import db
+from ..models import Appointment
+from . import stats_rollup
+from .availability import availability_index
+from .booking import booking_lock
+from .reference_cache import get_services
+from .scheduling import BLOCKED, CLOSED, OUTSIDE_HOURS, OVERLAP, load_schedules_for_dates, to_minutes
+from .slot_events import reload_event, slot_events
+
+REQUIRED_FIELDS = ('service_id', 'name', 'phone', 'date', 'start_time')
+STATUSES = ('pending', 'confirmed', 'completed', 'cancelled')
+
+REASON_MESSAGES = {
+    BLOCKED: 'The selected date is blocked',
+    CLOSED: 'The selected day is not a business day',
+    OUTSIDE_HOURS: 'The selected time is outside business hours',
+    OVERLAP: 'The selected time is not available',
+}
+
+
+def read_rows(stream, filename):
+    """Parse an uploaded .csv, .ndjson/.jsonl or .json file into a list of dicts."""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig')
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+
+    if extension == 'csv':
+        return list(csv.DictReader(text))
+    if extension in ('ndjson', 'jsonl'):
+        return [json.loads(line) for line in text if line.strip()]
+    if extension == 'json':
+        data = json.load(text)
+        return data.get('appointments', []) if isinstance(data, dict) else data
+    raise ValueError('Unsupported file type, use .csv, .ndjson or .json')
+
+
+def _prepare(number, raw, services):
+    """Validate one input row; returns (values, None) or (None, reason)."""
+    if not isinstance(raw, dict):
+        return None, 'Row must be an object'
+
+    missing = [field for field in REQUIRED_FIELDS if raw.get(field) in (None, '')]
+    if missing:
+        return None, f"Missing required fields: {', '.join(missing)}"
+
+    try:
+        service = services.get(int(raw['service_id']))
+    except (TypeError, ValueError):
+        service = None
+    if not service:
+        return None, 'Service not found'
+
+    try:
+        date = datetime.strptime(str(raw['date']), '%Y-%m-%d').date()
+        start_time = datetime.strptime(str(raw['start_time']), '%H:%M').time()
+        price = float(raw['price']) if raw.get('price') not in (None, '') else service.price
+        rating = int(raw['client_rating']) if raw.get('client_rating') not in (None, '') else None
+    except (TypeError, ValueError):
+        return None, 'Invalid date, time or number format'
+
+    if len(str(raw['name'])) > 100 or len(str(raw['phone'])) > 20:
+        return None, 'Name or phone is too long'
+
+    status = raw.get('status') or 'pending'
+    if status not in STATUSES:
+        return None, f"Invalid status: {status}"
+
+    end_time = (datetime.combine(date, start_time) + timedelta(minutes=service.duration)).time()
+    return {
+        'service_id': service.id,
+        'name': str(raw['name']),
+        'phone': str(raw['phone']),
+        'message': raw.get('message') or '',
+        'date': date,
+        'start_time': start_time,
+        'end_time': end_time,
+        'price': price,
+        'status': status,
+        'barber_notes': raw.get('barber_notes') or None,
+        'client_rating': rating,
+        'client_feedback': raw.get('client_feedback') or None,
+    }, None
+
+
+def _import_chunk(chunk, enforce_business_hours, dry_run, rejected, dry_run_schedules):
+    """Check one chunk of (row number, values) against existing and in-chunk bookings, then insert it.
+
+    A dry run commits nothing, so the schedules it has filled are kept in
+    ``dry_run_schedules`` for the next chunks - a date split across two
+    chunks then sees the rows accepted in the first one, as in a real run.
+    """
+    dates = sorted({values['date'] for _, values in chunk})
+    accepted = []
+
+    with booking_lock(*dates):
+        if dry_run:
+            schedules = {date: dry_run_schedules[date] for date in dates if date in dry_run_schedules}
+            schedules.update(load_schedules_for_dates([date for date in dates if date not in schedules]))
+            dry_run_schedules.update(schedules)
+        else:
+            schedules = load_schedules_for_dates(dates)
+
+        for number, values in chunk:
+            schedule = schedules[values['date']]
+            start, end = to_minutes(values['start_time']), to_minutes(values['end_time'])
+
+            if enforce_business_hours:
+                reason = schedule.check(start, end)
+            else:
+                if end <= start:
+                    reason = OUTSIDE_HOURS
+                else:
+                    reason = OVERLAP if schedule.is_booked(start, end) else None
+
+            if reason:
+                entry = {'row': number, 'reason': REASON_MESSAGES[reason]}
+                if reason == OVERLAP:
+                    # Existing appointments have positive ids, earlier rows of this import negative ones
+                    conflicts = schedule.conflicting_ids(start, end)
+                    entry['conflicts_with'] = [
+                        {'appointment_id': c} if c > 0 else {'row': -c} for c in conflicts
+                    ]
+                rejected.append(entry)
+                continue
+
+            schedule.add(-number, start, end)
+            accepted.append(values)
+
+        if dry_run or not accepted:
+            db.session.rollback()
+            return len(accepted)
+
+        db.session.execute(insert(Appointment), accepted)
+
+        # Bulk inserts skip the ORM flush, so feed the stats rollup directly
+        deltas = stats_rollup.new_deltas()
+        for values in accepted:
+            stats_rollup.add_delta(deltas, *stats_rollup.contribution(
+                values['date'], values['status'], values['service_id'], values['price'], values['client_rating']
+            ))
+        stats_rollup.apply_deltas(db.session.connection(), deltas)
+
+        db.session.commit()
+
+    availability_index.invalidate(dates)
+    slot_events.publish(*(reload_event(date) for date in sorted({values['date'] for values in accepted})))
+    return len(accepted)
+
+
+def import_appointments(rows, chunk_size=500, enforce_business_hours=True, dry_run=False):
+    """Import appointment rows in date order, one transaction per chunk.
+
+    Conflicts are detected in memory against the existing bookings of the
+    chunk's dates (one query per chunk) and against earlier rows of the same
+    import. Returns a report with the number imported and every rejected row
+    (1-based, in input order) with the reason.
+    """
+    services = get_services()
+    rejected = []
+    valid = []
+
+    for number, raw in enumerate(rows, start=1):
+        values, reason = _prepare(number, raw, services)
+        if reason:
+            rejected.append({'row': number, 'reason': reason})
+        else:
+            valid.append((number, values))
+
+    # Date order keeps each chunk to a few consecutive days
+    valid.sort(key=lambda item: (item[1]['date'], item[1]['start_time'], item[0]))
+
+    imported = 0
+    dry_run_schedules = {}
+    for offset in range(0, len(valid), chunk_size):
+        imported += _import_chunk(
+            valid[offset:offset + chunk_size], enforce_business_hours, dry_run, rejected, dry_run_schedules
+        )
+
+    rejected.sort(key=lambda entry: entry['row'])
+    return {
+        'total': len(rows),
+        'imported': imported,
+        'rejected': rejected,
+        'dry_run': dry_run
+    }
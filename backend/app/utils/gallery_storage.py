@@ -0,0 +1,116 @@
+import hashlib
+import os
+import tempfile
+import time as _time
+
+from flask import current_app
+
+from ..models import GalleryImage
+from .uploads import ImageUploadStream
+
+UPLOAD_URL = '/static/uploads'
+CHUNK_SIZE = 64 * 1024
+EXTENSIONS = {'jpeg': 'jpg'}
+
+
+def upload_folder():
+    return current_app.config['UPLOAD_FOLDER']
+
+
+def path_for(url):
+    """Filesystem path of an upload (or other /static/...) URL."""
+    if url.startswith(UPLOAD_URL + '/'):
+        return os.path.join(upload_folder(), *url[len(UPLOAD_URL) + 1:].split('/'))
+    return os.path.join(current_app.root_path, url.lstrip('/'))
+
+
+def content_url(content_hash, extension):
+    """Immutable URL for some content: sharded by the first hash bytes to keep directories small."""
+    return f"{UPLOAD_URL}/{content_hash[:2]}/{content_hash[2:4]}/{content_hash}.{extension}"
+
+
+def store(stream, extension):
+    """Save an upload under the sha256 of its content; returns (content_hash, url).
+
+    Identical content is stored once: if the file already exists the new
+    copy is dropped and the existing one is reused. An ImageUploadStream is
+    already hashed and on disk, so it is just moved into place, with the
+    extension taken from its magic bytes.
+    """
+    if isinstance(stream, ImageUploadStream):
+        url = content_url(stream.content_hash, stream.extension)
+        path = path_for(url)
+        if not stream.persist(path):
+            # Restart the grace period so a concurrent release() leaves it alone
+            os.utime(path)
+        return stream.content_hash, url
+
+    extension = extension.lower()
+    extension = EXTENSIONS.get(extension, extension)
+    folder = upload_folder()
+    os.makedirs(folder, exist_ok=True)
+
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=folder, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+                tmp.write(chunk)
+        os.chmod(tmp_path, 0o644)
+
+        content_hash = digest.hexdigest()
+        url = content_url(content_hash, extension)
+        path = path_for(url)
+        if os.path.exists(path):
+            # Restart the grace period so a concurrent release() leaves it alone
+            os.utime(path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+            tmp_path = None
+    finally:
+        if tmp_path is not None:
+            os.remove(tmp_path)
+
+    return content_hash, url
+
+
+def shared_variants(content_hash):
+    """Variants already generated for the same content by another gallery image, if any."""
+    image = GalleryImage.query.filter(
+        GalleryImage.content_hash == content_hash, GalleryImage.variants.isnot(None)
+    ).first()
+    return image.variants if image else None
+
+
+def remove_files(urls):
+    for url in urls:
+        path = path_for(url)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def remove_variants(variants):
+    remove_files(variant['url'] for variant in variants or [])
+
+
+def release(content_hash, file_path, variants):
+    """Delete a file and its variants once no gallery image references them; call after commit.
+
+    Files stored in the last UPLOAD_REMOVE_GRACE seconds are kept, since an
+    upload of the same content may be about to commit a reference to them;
+    the orphaned-upload GC removes them later if not. Returns True when the
+    files were removed.
+    """
+    if content_hash:
+        if GalleryImage.query.filter_by(content_hash=content_hash).first() is not None:
+            return False
+        path = path_for(file_path)
+        grace = current_app.config.get('UPLOAD_REMOVE_GRACE', 60)
+        if os.path.exists(path) and _time.time() - os.path.getmtime(path) < grace:
+            return False
+
+    remove_files([file_path])
+    remove_variants(variants)
+    return True
@@ -0,0 +1,60 @@
+from functools import wraps
+
+from flask import make_response, request
+
+from .reference_cache import reference_cache
+
+
+def conditional(*names, max_age=0):
+    """ETag / Last-Modified for a GET view whose output depends only on the ``names`` tables.
+
+    The validators come from the cache_generations version stamps, so a
+    matching If-None-Match / If-Modified-Since is answered with 304 before
+    the view runs - at most the throttled generation check, usually no
+    query at all. Every writer to those tables must call
+    ``reference_cache.bump(name)``.
+
+    By default the response is ``no-cache``: the browser revalidates every
+    time, so an admin page that refetches after an edit sees it at once.
+    Only pass ``max_age`` where a copy that old is acceptable.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return f(*args, **kwargs)
+
+            versions = [reference_cache.version(name) for name in names]
+            # updated_at is part of the tag: generations start over at 0 when the tables are recreated
+            etag = '-'.join(
+                f"{name}.{generation}.{int(updated_at.timestamp() * 1000) if updated_at else 0:x}"
+                for name, (generation, updated_at) in zip(names, versions)
+            )
+            stamps = [updated_at for _, updated_at in versions if updated_at is not None]
+            last_modified = max(stamps).replace(microsecond=0) if stamps else None
+
+            if request.if_none_match:
+                # Weak comparison: nginx's gzip turns the tag into W/"..."
+                not_modified = request.if_none_match.contains_weak(etag)
+            else:
+                since = request.if_modified_since
+                not_modified = bool(since and last_modified and last_modified <= since.replace(tzinfo=None))
+
+            if not_modified:
+                response = make_response('', 304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            if last_modified:
+                response.last_modified = last_modified
+            response.cache_control.public = True
+            if max_age:
+                response.cache_control.max_age = max_age
+            else:
+                response.cache_control.no_cache = True
+            return response
+        return decorated_function
+    return decorator
@@ -0,0 +1,54 @@
+import threading
+import time as _time
+from collections import OrderedDict
+
+from .. import db
+from ..models import User
+
+# Cached for ids that don't (or no longer) match a user
+MISSING = object()
+
+
+class IdentityCache:
+    """Bounded LRU of user id -> role with a short TTL, for admin_required.
+
+    Tokens carry the role they were issued with; this cache confirms that
+    the user still exists and still has it, without a query per request.
+    Entries are dropped on change_password in this worker; other workers
+    pick changes up within ``ttl`` seconds.
+    """
+
+    def __init__(self, ttl=30, max_size=1024):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()  # user_id -> (loaded_at, role)
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.ttl = app.config.get('IDENTITY_CACHE_TTL', self.ttl)
+        self.max_size = app.config.get('IDENTITY_CACHE_SIZE', self.max_size)
+
+    def get_role(self, user_id):
+        """Role of ``user_id``, or MISSING if there is no such user."""
+        now = _time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and now - entry[0] < self.ttl:
+                self._entries.move_to_end(user_id)
+                return entry[1]
+
+        user = db.session.get(User, user_id)
+        role = user.role if user else MISSING
+        with self._lock:
+            self._entries[user_id] = (now, role)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return role
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+identity_cache = IdentityCache()
@@ -0,0 +1,139 @@
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # optional: without Pillow images are only served as uploaded
+    Image = None
+
+from .. import db
+from ..models import GalleryImage
+from .gallery_storage import path_for, remove_variants
+from .reference_cache import GALLERY, reference_cache
+
+logger = logging.getLogger(__name__)
+
+WEBP = 'image/webp'
+FORMATS = {
+    # mime type -> (Pillow format, extension, save options)
+    WEBP: ('WEBP', 'webp', {'method': 4}),
+    'image/jpeg': ('JPEG', 'jpg', {'optimize': True, 'progressive': True}),
+    'image/png': ('PNG', 'png', {'optimize': True}),
+}
+
+
+class ImageVariants:
+    """Resized JPEG/PNG and WebP copies of gallery images, encoded on a small thread pool.
+
+    Pillow releases the GIL while decoding, resizing and encoding, so a few
+    threads keep up with uploads without blocking the request that
+    triggered them. Variants are written next to the original as
+    ``<name>_<width>w.<ext>`` and recorded on ``GalleryImage.variants``;
+    for content-addressed files that makes them shared by every image
+    with the same content. There is one job per content at a time: a
+    re-upload while it is encoding gets its result instead of a second job.
+    """
+
+    def __init__(self, widths=(320, 640, 1024, 1600), quality=80, workers=2):
+        self.widths = widths
+        self.quality = quality
+        self.workers = workers
+        self._executor = None
+        self._pending = {}  # content_hash (file_path for images without one) -> Future
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.widths = tuple(app.config.get('IMAGE_VARIANT_WIDTHS', self.widths))
+        self.quality = app.config.get('IMAGE_VARIANT_QUALITY', self.quality)
+        self.workers = app.config.get('IMAGE_VARIANT_WORKERS', self.workers)
+
+    @property
+    def available(self):
+        return Image is not None
+
+    def schedule(self, image):
+        """Generate the variants of ``image`` in the background; returns the Future (None without Pillow)."""
+        if Image is None:
+            logger.info("Pillow is not installed, skipping image variants for %s", image.file_path)
+            return None
+        key = image.content_hash or image.file_path
+        app = current_app._get_current_object()
+        with self._lock:
+            if key in self._pending:
+                return self._pending[key]
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='image-variants')
+            future = self._pending[key] = self._executor.submit(
+                self._run, app, key, image.content_hash, image.file_path
+            )
+        return future
+
+    def _run(self, app, key, content_hash, file_path):
+        with app.app_context():
+            try:
+                variants = self.generate(file_path)
+            except Exception:
+                logger.exception("Could not generate variants for %s", file_path)
+                return
+            finally:
+                # Images committed from here on are found by the query below;
+                # a later schedule() for the same content starts a new job
+                with self._lock:
+                    self._pending.pop(key, None)
+
+            if content_hash:
+                query = GalleryImage.query.filter_by(content_hash=content_hash)
+            else:
+                query = GalleryImage.query.filter_by(file_path=file_path)
+            images = query.all()
+            if not images:
+                # Deleted or replaced while we were encoding
+                db.session.rollback()
+                remove_variants(variants)
+                return
+            for image in images:
+                image.variants = variants
+            reference_cache.bump(GALLERY)
+            db.session.commit()
+
+    def generate(self, file_path):
+        """Encode every width (capped at the original's) as WebP plus JPEG, or PNG for transparent images."""
+        url_stem = os.path.splitext(file_path)[0]
+        variants = []
+
+        with Image.open(path_for(file_path)) as source:
+            image = ImageOps.exif_transpose(source)
+            transparent = image.mode in ('RGBA', 'LA') or 'transparency' in image.info
+            image = image.convert('RGBA' if transparent else 'RGB')
+            fallback = 'image/png' if transparent else 'image/jpeg'
+
+            for width in sorted({min(width, image.width) for width in self.widths}):
+                height = max(1, round(image.height * width / image.width))
+                resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+
+                for mime_type in (WEBP, fallback):
+                    pillow_format, extension, options = FORMATS[mime_type]
+                    url = f"{url_stem}_{width}w.{extension}"
+                    path = path_for(url)
+                    # Write under a temporary name so a half-written file is never served;
+                    # a unique one, since another job may be writing the same variant
+                    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+                    try:
+                        with os.fdopen(fd, 'wb') as tmp:
+                            resized.save(tmp, pillow_format, quality=self.quality, **options)
+                        os.chmod(tmp_path, 0o644)
+                        os.replace(tmp_path, path)
+                    except BaseException:
+                        os.remove(tmp_path)
+                        raise
+                    variants.append({'width': width, 'height': height, 'type': mime_type, 'url': url})
+
+        return variants
+
+
+image_variants = ImageVariants()
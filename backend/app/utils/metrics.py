@@ -0,0 +1,192 @@
+import threading
+import time as _time
+from bisect import bisect_left
+
+from flask import g, request
+
+# Latency buckets in seconds (upper bounds, +Inf is implied)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Dead threads' shards are folded together once there are more than this many
+MAX_SHARDS = 64
+
+
+class _Shard:
+    """The counters of one thread. Only that thread writes to it, so no lock is needed."""
+
+    def __init__(self, buckets):
+        self.thread = threading.current_thread()
+        self.size = len(buckets) + 2  # bucket counts, +Inf, then the sum at the end
+        self.latency = {}  # (blueprint, endpoint, method) -> [count per bucket..., +Inf, sum]
+        self.status = {}  # (blueprint, endpoint, method, status) -> count
+        self.in_flight = {}  # (blueprint, endpoint) -> requests running now
+
+    def merge_into(self, other):
+        # list() copies the dicts in one step, even while the owning thread adds keys
+        for key, values in list(self.latency.items()):
+            target = other.latency.setdefault(key, [0] * self.size)
+            for i, value in enumerate(values):
+                target[i] += value
+        for key, count in list(self.status.items()):
+            other.status[key] = other.status.get(key, 0) + count
+        for key, count in list(self.in_flight.items()):
+            other.in_flight[key] = other.in_flight.get(key, 0) + count
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+class RequestMetrics:
+    """Per-endpoint latency histograms, status code counts and in-flight gauges.
+
+    Each thread records into its own shard (thread-local), so the request
+    path never waits on a lock; the shards are only summed when /metrics is
+    scraped. Endpoints, not paths, are used as labels (unmatched URLs are
+    ``endpoint="unmatched"``), which keeps the number of series bounded.
+    The numbers are per worker process: Prometheus should scrape every
+    worker, or run one worker per scraped target.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._local = threading.local()
+        self._shards = []
+        self._retired = _Shard(self.buckets)  # folded shards of finished threads
+        self._lock = threading.Lock()  # only for adding / folding shards and for rendering
+
+    def init_app(self, app):
+        self.buckets = tuple(app.config.get('METRICS_BUCKETS', self.buckets))
+        self._local = threading.local()
+        self._shards = []
+        self._retired = _Shard(self.buckets)
+
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._teardown)
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = _Shard(self.buckets)
+            with self._lock:
+                if len(self._shards) >= MAX_SHARDS:
+                    self._fold_dead_shards()
+                self._shards.append(shard)
+        return shard
+
+    def _fold_dead_shards(self):
+        alive = []
+        for shard in self._shards:
+            if shard.thread.is_alive():
+                alive.append(shard)
+            else:
+                shard.merge_into(self._retired)
+        self._shards = alive
+
+    @staticmethod
+    def _endpoint():
+        return request.blueprint or '', request.endpoint or 'unmatched'
+
+    def _start(self):
+        g._metrics_started = _time.perf_counter()
+        key = self._endpoint()
+        in_flight = self._shard().in_flight
+        in_flight[key] = in_flight.get(key, 0) + 1
+        g._metrics_in_flight = key
+
+    def _finish(self, response):
+        started = g.pop('_metrics_started', None)
+        if started is None:
+            return response
+        elapsed = _time.perf_counter() - started
+        blueprint, endpoint = self._endpoint()
+        shard = self._shard()
+
+        key = (blueprint, endpoint, request.method)
+        values = shard.latency.get(key)
+        if values is None:
+            values = shard.latency[key] = [0] * shard.size
+        values[bisect_left(self.buckets, elapsed)] += 1
+        values[-1] += elapsed
+
+        key = (blueprint, endpoint, request.method, response.status_code)
+        shard.status[key] = shard.status.get(key, 0) + 1
+        return response
+
+    def _teardown(self, exc):
+        key = g.pop('_metrics_in_flight', None)
+        if key is not None:
+            in_flight = self._shard().in_flight
+            in_flight[key] = in_flight.get(key, 0) - 1
+
+    def snapshot(self):
+        """All shards summed into one."""
+        total = _Shard(self.buckets)
+        with self._lock:
+            self._fold_dead_shards()
+            self._retired.merge_into(total)
+            for shard in self._shards:
+                # Read while its thread may still write: a scrape can be off by a request in flight
+                shard.merge_into(total)
+        return total
+
+    def render(self, extra=()):
+        """Prometheus text exposition format (version 0.0.4); ``extra`` holds (name, type, help, value) tuples."""
+        total = self.snapshot()
+        lines = [
+            '# HELP http_request_duration_seconds Request latency by endpoint.',
+            '# TYPE http_request_duration_seconds histogram',
+        ]
+        bounds = [repr(float(bound)) for bound in self.buckets] + ['+Inf']
+        for (blueprint, endpoint, method), values in sorted(total.latency.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, values):
+                cumulative += count
+                labels = _labels(blueprint=blueprint, endpoint=endpoint, method=method, le=bound)
+                lines.append(f'http_request_duration_seconds_bucket{labels} {cumulative}')
+            labels = _labels(blueprint=blueprint, endpoint=endpoint, method=method)
+            lines.append(f'http_request_duration_seconds_sum{labels} {values[-1]}')
+            lines.append(f'http_request_duration_seconds_count{labels} {cumulative}')
+
+        lines += [
+            '# HELP http_requests_total Finished requests by endpoint and status code.',
+            '# TYPE http_requests_total counter',
+        ]
+        for (blueprint, endpoint, method, status), count in sorted(total.status.items()):
+            labels = _labels(blueprint=blueprint, endpoint=endpoint, method=method, status=status)
+            lines.append(f'http_requests_total{labels} {count}')
+
+        lines += [
+            '# HELP http_requests_in_flight Requests being handled right now.',
+            '# TYPE http_requests_in_flight gauge',
+        ]
+        for (blueprint, endpoint), count in sorted(total.in_flight.items()):
+            lines.append(f'http_requests_in_flight{_labels(blueprint=blueprint, endpoint=endpoint)} {count}')
+
+        for name, metric_type, help_text, value in extra:
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {metric_type}', f'{name} {value}']
+        return '\n'.join(lines) + '\n'
+
+
+def pool_gauges(engine):
+    """SQLAlchemy connection pool statistics, for pools that keep them (QueuePool)."""
+    pool = engine.pool
+    gauges = []
+    for name, attr, help_text in (
+        ('db_pool_size', 'size', 'Configured number of pooled connections.'),
+        ('db_pool_checked_out', 'checkedout', 'Connections in use.'),
+        ('db_pool_checked_in', 'checkedin', 'Idle connections in the pool.'),
+        ('db_pool_overflow', 'overflow', 'Connections open beyond the pool size (negative: not yet opened).'),
+    ):
+        method = getattr(pool, attr, None)
+        if method is not None:
+            gauges.append((name, 'gauge', help_text, method()))
+    return gauges
+
+
+request_metrics = RequestMetrics()
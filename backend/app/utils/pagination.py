@@ -0,0 +1,37 @@
+import base64
+import json
+
+from flask import current_app
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    """Opaque, URL-safe token for the sort key of the last row on a page."""
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, length):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+    if not isinstance(values, list) or len(values) != length:
+        raise InvalidCursor('Invalid cursor')
+    return values
+
+
+def page_size(value, default_key, max_key):
+    """Parse a ``limit`` argument, falling back to / capping at the configured sizes."""
+    default = current_app.config.get(default_key, 50)
+    maximum = current_app.config.get(max_key, 200)
+    if value in (None, ''):
+        return default
+    size = int(value)
+    if size < 1:
+        raise ValueError('limit must be positive')
+    return min(size, maximum)
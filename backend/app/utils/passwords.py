@@ -0,0 +1,88 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class PasswordHashBusy(Exception):
+    """Too many password hashes are queued; the caller should answer 503."""
+
+
+class PasswordHasher:
+    """Runs password hashing and verification on a bounded process pool.
+
+    Hashing is deliberately slow CPU work. Off-loading it keeps a burst of
+    logins from eating the CPU time of the workers serving bookings, and
+    the bounded queue turns an overload into a quick 503 instead of a pile
+    of stalled requests. With ``workers = 0`` everything runs inline.
+
+    The pool and the queue bound belong to one worker process. The bound
+    therefore only matters for threaded gunicorn workers; a sync worker
+    waits for its single hash anyway, and the total number of hashing
+    processes grows with the number of workers.
+    """
+
+    def __init__(self, method='scrypt:32768:8:1', workers=2, max_pending=8, timeout=10):
+        self.method = method
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._pool = None
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        # Verified against when the username doesn't exist, so both cases take as long
+        self._dummy_hash = None
+
+    def init_app(self, app):
+        self.method = app.config.get('PASSWORD_HASH_METHOD', self.method)
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', self.workers)
+        self.max_pending = app.config.get('PASSWORD_HASH_MAX_PENDING', self.max_pending)
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', self.timeout)
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        # No waiting for a slot: a full queue answers 503 right away
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHashBusy()
+        try:
+            with self._lock:
+                # Created lazily, i.e. after gunicorn has forked the worker. The worker
+                # already runs threads (log writer, SSE, image variants), so the pool
+                # processes are started by a clean forkserver instead of forking it.
+                if self._pool is None:
+                    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                    self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context(method))
+            try:
+                return self._pool.submit(fn, *args).result(timeout=self.timeout)
+            except FutureTimeout:
+                raise PasswordHashBusy()
+            except BrokenProcessPool:
+                # A pool process died (e.g. OOM-killed): start a new pool on the next call
+                with self._lock:
+                    self._pool = None
+                raise PasswordHashBusy()
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        """Check ``password``; for an unknown user (``password_hash=None``) a dummy hash is checked."""
+        if password_hash is None:
+            if self._dummy_hash is None:
+                self._dummy_hash = self.hash('not a password')
+            self._run(check_password_hash, self._dummy_hash, password)
+            return False
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True when the hash was made with other parameters than PASSWORD_HASH_METHOD."""
+        return password_hash.split('$', 1)[0] != self.method
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,35 @@
+from functools import wraps
+
+from flask import current_app, request
+
+# Statements are counted by the SQL profiler's engine events
+from .sql_profiler import query_count
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(max_queries):
+    """Fail loudly when a view issues more than ``max_queries`` statements.
+
+    Guards list endpoints against N+1 relationship loads: their query count
+    must not grow with the number of rows returned. With
+    QUERY_BUDGET_STRICT set the view raises QueryBudgetExceeded, otherwise
+    a warning is logged.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            start = query_count()
+            response = f(*args, **kwargs)
+            used = query_count() - start
+
+            if used > max_queries:
+                message = f"{request.endpoint} issued {used} queries (budget {max_queries})"
+                if current_app.config.get('QUERY_BUDGET_STRICT'):
+                    raise QueryBudgetExceeded(message)
+                current_app.logger.warning(message)
+            return response
+        return decorated_function
+    return decorator
@@ -0,0 +1,69 @@
+import threading
+import time as _time
+from collections import OrderedDict, deque
+
+
+class SlidingWindowLimiter:
+    """In-memory limit of ``limit`` hits per ``window`` seconds per key (IP, username, ...).
+
+    Each key keeps the timestamps of its hits inside the window, so the
+    limit holds over any window-long interval, not just per fixed bucket.
+    At most ``max_keys`` keys are tracked; the least recently used are
+    forgotten first. Per worker process, like the other in-memory caches.
+    """
+
+    def __init__(self, limit, window, max_keys=10000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._hits = OrderedDict()  # key -> deque of monotonic timestamps
+        self._lock = threading.Lock()
+
+    def configure(self, limit, window):
+        self.limit = limit
+        self.window = window
+
+    def _recent(self, key, now):
+        hits = self._hits.get(key)
+        if hits is None:
+            return None
+        while hits and now - hits[0] >= self.window:
+            hits.popleft()
+        return hits
+
+    def retry_after(self, key):
+        """Seconds until ``key`` may try again, 0 if it is under the limit."""
+        now = _time.monotonic()
+        with self._lock:
+            hits = self._recent(key, now)
+            if not hits or len(hits) < self.limit:
+                return 0
+            return max(1, int(self.window - (now - hits[0])) + 1)
+
+    def hit(self, key):
+        now = _time.monotonic()
+        with self._lock:
+            hits = self._recent(key, now)
+            if hits is None:
+                hits = self._hits[key] = deque()
+            hits.append(now)
+            self._hits.move_to_end(key)
+            while len(self._hits) > self.max_keys:
+                self._hits.popitem(last=False)
+
+    def reset(self, key):
+        with self._lock:
+            self._hits.pop(key, None)
+
+
+# Login attempts per client IP, failed attempts per (client IP, username), and failed
+# attempts per username from all clients together (brute force spread over many IPs)
+login_ip_limiter = SlidingWindowLimiter(20, 60)
+login_username_limiter = SlidingWindowLimiter(5, 300)
+login_account_limiter = SlidingWindowLimiter(100, 900)
+
+
+def init_app(app):
+    login_ip_limiter.configure(*app.config.get('LOGIN_RATE_LIMIT_IP', (20, 60)))
+    login_username_limiter.configure(*app.config.get('LOGIN_RATE_LIMIT_USERNAME', (5, 300)))
+    login_account_limiter.configure(*app.config.get('LOGIN_RATE_LIMIT_ACCOUNT', (100, 900)))
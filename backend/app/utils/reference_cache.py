@@ -0,0 +1,190 @@
+import threading
+import time as _time
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy import event, update
+
+from .. import db
+from ..models import BlockedDate, BusinessHours, CacheGeneration, Service
+
+SERVICES = 'services'
+BUSINESS_HOURS = 'business_hours'
+BLOCKED_DATES = 'blocked_dates'
+# Versioned only (for HTTP validators), not cached in process
+GALLERY = 'gallery'
+REVIEWS = 'reviews'
+
+
+# Immutable snapshots of the cached rows. They reuse the models' to_dict, so
+# the API output is identical whether it comes from the cache or the database.
+class ServiceInfo(namedtuple('ServiceInfo', 'id name description duration price')):
+    __slots__ = ()
+    to_dict = Service.to_dict
+
+
+class BusinessHoursInfo(namedtuple('BusinessHoursInfo', 'id day_of_week is_open open_time close_time')):
+    __slots__ = ()
+    to_dict = BusinessHours.to_dict
+
+
+class BlockedDateInfo(namedtuple('BlockedDateInfo', 'id date reason')):
+    __slots__ = ()
+    to_dict = BlockedDate.to_dict
+
+
+def _load_services():
+    return {s.id: ServiceInfo(s.id, s.name, s.description, s.duration, s.price)
+            for s in Service.query.order_by(Service.id)}
+
+
+def _load_business_hours():
+    hours_by_day = {}
+    for h in BusinessHours.query.order_by(BusinessHours.id):
+        # Same as filter_by(day_of_week=...).first(): the first row for a day wins
+        hours_by_day.setdefault(
+            h.day_of_week, BusinessHoursInfo(h.id, h.day_of_week, h.is_open, h.open_time, h.close_time)
+        )
+    return hours_by_day
+
+
+def _load_blocked_dates():
+    return {b.date: BlockedDateInfo(b.id, b.date, b.reason)
+            for b in BlockedDate.query.order_by(BlockedDate.date)}
+
+
+LOADERS = {
+    SERVICES: _load_services,
+    BUSINESS_HOURS: _load_business_hours,
+    BLOCKED_DATES: _load_blocked_dates,
+}
+
+VERSIONED = tuple(LOADERS) + (GALLERY, REVIEWS)
+
+
+class ReferenceCache:
+    """In-process cache for rarely changing tables, invalidated by generation.
+
+    Every cached table has a row in ``cache_generations``. Writers call
+    ``bump(name)`` in the same transaction as their change; readers compare
+    the generation they loaded with the current one, which is re-read with a
+    single small query at most every ``check_interval`` seconds. That keeps
+    gunicorn workers within ``check_interval`` of each other without any
+    query on the hot path, and a worker sees its own changes immediately.
+
+    A loaded value is matched on (generation, updated_at), so a generation
+    that starts over from 0 (recreated tables) isn't mistaken for the one
+    cached; and it is reloaded after ``max_age`` seconds regardless, as a
+    fallback for writes that don't bump.
+    """
+
+    def __init__(self, check_interval=1.0, max_age=300):
+        self.check_interval = check_interval
+        self.max_age = max_age
+        self._generations = {}
+        self._updated_at = {}
+        self._checked_at = None
+        self._entries = {}  # name -> (version, loaded_at, value)
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.check_interval = app.config.get('REFERENCE_CACHE_CHECK_INTERVAL', self.check_interval)
+        self.max_age = app.config.get('REFERENCE_CACHE_MAX_AGE', self.max_age)
+        if not event.contains(db.session, 'after_commit', _after_commit):
+            event.listen(db.session, 'after_commit', _after_commit)
+            event.listen(db.session, 'after_soft_rollback', _after_rollback)
+
+    def ensure_generations(self):
+        """Create the generation rows so bump() only ever has to UPDATE."""
+        existing = {row.name for row in CacheGeneration.query.all()}
+        for name in VERSIONED:
+            if name not in existing:
+                db.session.add(CacheGeneration(name=name, generation=0, updated_at=datetime.utcnow()))
+        db.session.commit()
+
+    def generations(self):
+        """Current generation of every versioned table, re-read when the check interval has passed."""
+        now = _time.monotonic()
+        with self._lock:
+            if self._checked_at is not None and now - self._checked_at < self.check_interval:
+                return self._generations
+
+        rows = db.session.query(
+            CacheGeneration.name, CacheGeneration.generation, CacheGeneration.updated_at
+        ).all()
+        generations = {name: generation for name, generation, _ in rows}
+        updated_at = {name: changed for name, _, changed in rows}
+        with self._lock:
+            self._generations = generations
+            self._updated_at = updated_at
+            self._checked_at = now
+        return generations
+
+    def version(self, name):
+        """(generation, updated_at) of ``name``, subject to the same check interval as generations()."""
+        generation = self.generations().get(name, 0)
+        with self._lock:
+            return generation, self._updated_at.get(name)
+
+    def get(self, name):
+        version = self.version(name)
+        now = _time.monotonic()
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry[0] == version and now - entry[1] < self.max_age:
+                return entry[2]
+
+        value = LOADERS[name]()
+        with self._lock:
+            self._entries[name] = (version, now, value)
+        return value
+
+    def bump(self, name):
+        """Mark ``name`` as changed; takes effect when the current transaction commits."""
+        result = db.session.execute(
+            update(CacheGeneration)
+            .where(CacheGeneration.name == name)
+            .values(generation=CacheGeneration.generation + 1, updated_at=datetime.utcnow())
+        )
+        if result.rowcount == 0:
+            db.session.add(CacheGeneration(name=name, generation=1, updated_at=datetime.utcnow()))
+        db.session.info.setdefault('reference_cache_bumped', set()).add(name)
+
+    def expire(self):
+        """Force the next read to re-check generations with the database."""
+        with self._lock:
+            self._checked_at = None
+
+
+reference_cache = ReferenceCache()
+
+
+def _after_commit(session):
+    if session.info.pop('reference_cache_bumped', None):
+        reference_cache.expire()
+
+
+def _after_rollback(session, previous_transaction):
+    session.info.pop('reference_cache_bumped', None)
+
+
+def get_services():
+    """All services as ServiceInfo, keyed by id."""
+    return reference_cache.get(SERVICES)
+
+
+def get_service(service_id):
+    try:
+        return get_services().get(int(service_id))
+    except (TypeError, ValueError):
+        return None
+
+
+def get_business_hours():
+    """BusinessHoursInfo keyed by day_of_week (0=Monday)."""
+    return reference_cache.get(BUSINESS_HOURS)
+
+
+def get_blocked_dates():
+    """BlockedDateInfo keyed by date, in date order."""
+    return reference_cache.get(BLOCKED_DATES)
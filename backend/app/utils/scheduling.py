@@ -0,0 +1,201 @@
+from datetime import timedelta
+
+from sqlalchemy import and_
+
+from ..models import Appointment
+from .reference_cache import get_blocked_dates, get_business_hours
+
+MINUTES_PER_DAY = 24 * 60
+SLOT_STEP_MINUTES = 30
+
+# Reasons returned by DaySchedule.check()
+BLOCKED = 'blocked'
+CLOSED = 'closed'
+OUTSIDE_HOURS = 'outside_hours'
+OVERLAP = 'overlap'
+
+
+def to_minutes(value):
+    """Convert a datetime.time to minutes since midnight."""
+    return value.hour * 60 + value.minute
+
+
+def format_minutes(minutes):
+    return f'{minutes // 60:02d}:{minutes % 60:02d}'
+
+
+def span_mask(start, end):
+    """Bit mask with the minutes [start, end) set."""
+    if end <= start:
+        return 0
+    return ((1 << (end - start)) - 1) << start
+
+
+def run_starts(mask, length):
+    """Mask of minutes i for which [i, i + length) is entirely set in ``mask``.
+
+    Uses shift-and doubling, so it needs O(log length) big-int operations
+    instead of testing every candidate start.
+    """
+    if length <= 0:
+        return mask
+    covered = 1
+    while covered < length:
+        shift = min(covered, length - covered)
+        mask &= mask >> shift
+        covered += shift
+    return mask
+
+
+class DaySchedule:
+    """A working day as a bit array of minutes (bit i = minute i after midnight).
+
+    ``hours_mask`` has the business hours set, or nothing for blocked and
+    closed days; ``booked_mask`` has every booked minute set. Free time is
+    simply ``hours_mask & ~booked_mask``.
+    """
+
+    def __init__(self, date, open_minute=None, close_minute=None, blocked=False):
+        self.date = date
+        self.open_minute = open_minute
+        self.close_minute = close_minute
+        self.blocked = blocked
+        self.hours_mask = 0 if blocked or open_minute is None else span_mask(open_minute, close_minute)
+        self.bookings = {}  # appointment_id -> (start, end)
+        self.booked_mask = 0
+
+    @property
+    def is_open(self):
+        return self.hours_mask != 0
+
+    @property
+    def free_mask(self):
+        return self.hours_mask & ~self.booked_mask
+
+    def add(self, appointment_id, start, end):
+        if appointment_id in self.bookings:
+            self.remove(appointment_id)
+        # Copy-on-write so schedules shared through the index stay readable
+        bookings = dict(self.bookings)
+        bookings[appointment_id] = (start, end)
+        self.bookings = bookings
+        self.booked_mask |= span_mask(start, end)
+
+    def remove(self, appointment_id):
+        if appointment_id in self.bookings:
+            bookings = dict(self.bookings)
+            del bookings[appointment_id]
+            self.bookings = bookings
+            # Bookings may overlap, so rebuild rather than clearing bits
+            self.booked_mask = self._booked_without(None)
+
+    def _booked_without(self, exclude_id):
+        mask = 0
+        for appointment_id, (start, end) in self.bookings.items():
+            if appointment_id != exclude_id:
+                mask |= span_mask(start, end)
+        return mask
+
+    def check(self, start, end, exclude_id=None):
+        """Return None if [start, end) can be booked, otherwise the reason why not."""
+        if self.blocked:
+            return BLOCKED
+        if not self.is_open:
+            return CLOSED
+        if not 0 <= start < end <= MINUTES_PER_DAY:
+            return OUTSIDE_HOURS
+        wanted = span_mask(start, end)
+        if self.hours_mask & wanted != wanted:
+            return OUTSIDE_HOURS
+        if self.is_booked(start, end, exclude_id):
+            return OVERLAP
+        return None
+
+    def is_booked(self, start, end, exclude_id=None):
+        """True if any booking other than ``exclude_id`` overlaps [start, end), ignoring business hours."""
+        booked = self.booked_mask if exclude_id not in self.bookings else self._booked_without(exclude_id)
+        return bool(booked & span_mask(start, end))
+
+    def conflicting_ids(self, start, end):
+        """Ids of the bookings overlapping [start, end)."""
+        return [appointment_id for appointment_id, (b_start, b_end) in self.bookings.items()
+                if b_start < end and start < b_end]
+
+    def is_free(self, start, end, exclude_id=None):
+        return self.check(start, end, exclude_id) is None
+
+    def free_starts(self, duration, step=SLOT_STEP_MINUTES):
+        """Slot starts (open_minute + k * step) where ``duration`` minutes are free."""
+        if not self.is_open:
+            return []
+        runs = run_starts(self.free_mask, duration)
+        return [start for start in self.slot_starts(duration, step) if runs >> start & 1]
+
+    def slot_starts(self, duration, step=SLOT_STEP_MINUTES):
+        if not self.is_open:
+            return []
+        return list(range(self.open_minute, self.close_minute - duration + 1, step))
+
+    def next_free(self, duration, after=0):
+        """First minute >= ``after`` where ``duration`` free minutes start, or None."""
+        runs = run_starts(self.free_mask, duration) >> after << after
+        if not runs:
+            return None
+        return (runs & -runs).bit_length() - 1
+
+    def slots(self, duration, step=SLOT_STEP_MINUTES):
+        """Return (all_slots, available_slots, booked_slots) as lists of minutes."""
+        all_slots = self.slot_starts(duration, step)
+        available = self.free_starts(duration, step)
+        free = set(available)
+        return all_slots, available, [start for start in all_slots if start not in free]
+
+
+def _empty_schedule(date, hours_by_day, blocked):
+    hours = hours_by_day.get(date.weekday())
+    if hours and hours.is_open:
+        return DaySchedule(date, to_minutes(hours.open_time), to_minutes(hours.close_time), date in blocked)
+    return DaySchedule(date, blocked=date in blocked)
+
+
+def _fill_schedules(days, appointment_filter):
+    rows = Appointment.query.with_entities(
+        Appointment.id, Appointment.date, Appointment.start_time, Appointment.end_time
+    ).filter(appointment_filter).all()
+    for row in rows:
+        days[row.date].add(row.id, to_minutes(row.start_time), to_minutes(row.end_time))
+    return days
+
+
+def load_day_schedules(start_date, end_date):
+    """Build a DaySchedule for every date in [start_date, end_date].
+
+    Blocked dates and business hours come from the reference cache, and the
+    appointments are loaded with a single query however many days the range
+    covers.
+    """
+    blocked = get_blocked_dates()
+    hours_by_day = get_business_hours()
+
+    days = {}
+    date = start_date
+    while date <= end_date:
+        days[date] = _empty_schedule(date, hours_by_day, blocked)
+        date += timedelta(days=1)
+
+    days = _fill_schedules(days, and_(Appointment.date >= start_date, Appointment.date <= end_date))
+    return list(days.values())
+
+
+def load_schedules_for_dates(dates):
+    """DaySchedule keyed by date for an arbitrary set of dates, with one appointments query."""
+    blocked = get_blocked_dates()
+    hours_by_day = get_business_hours()
+    days = {date: _empty_schedule(date, hours_by_day, blocked) for date in set(dates)}
+    if not days:
+        return days
+    return _fill_schedules(days, Appointment.date.in_(list(days)))
+
+
+def load_day_schedule(date):
+    return load_day_schedules(date, date)[0]
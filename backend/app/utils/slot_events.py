@@ -0,0 +1,176 @@
+import itertools
+import json
+import logging
+import queue
+import threading
+import time as _time
+
+try:
+    import redis
+except ImportError:  # optional, only needed for SLOT_EVENTS_REDIS_URL
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+CREATED = 'created'
+UPDATED = 'updated'
+DELETED = 'deleted'
+# Many rows of a date changed at once (bulk import): clients reload that date
+RELOAD = 'reload'
+
+
+def slot_event(action, appointment, previous=None):
+    """Compact event for one appointment; ``previous`` is its old (date, start_time, end_time)."""
+    event = {
+        'action': action,
+        'id': appointment.id,
+        'date': appointment.date.isoformat(),
+        'start': appointment.start_time.strftime('%H:%M'),
+        'end': appointment.end_time.strftime('%H:%M'),
+        'status': appointment.status,
+    }
+    if previous is not None:
+        date, start_time, end_time = previous
+        event['previous'] = {
+            'date': date.isoformat(),
+            'start': start_time.strftime('%H:%M'),
+            'end': end_time.strftime('%H:%M'),
+        }
+    return event
+
+
+def reload_event(date):
+    return {'action': RELOAD, 'date': date.isoformat()}
+
+
+class Subscription:
+    """One stream's bounded event queue.
+
+    A subscriber that falls behind doesn't block publishers: its queue is
+    emptied and it gets a single resync event instead (``overflowed``).
+    """
+
+    def __init__(self, maxsize):
+        self._queue = queue.Queue(maxsize)
+        self.overflowed = False
+
+    def put(self, item):
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout):
+        """Next (id, event), or None after ``timeout`` seconds without one."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def reset(self):
+        with self._queue.mutex:
+            self._queue.queue.clear()
+        self.overflowed = False
+
+
+class MemoryBroker:
+    """Fans events out to the subscribers of this process only."""
+
+    def __init__(self, queue_size=256):
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def publish(self, event):
+        self.deliver(event)
+
+    def deliver(self, event):
+        with self._lock:
+            event_id = next(self._ids)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.put((event_id, event))
+
+    def subscribe(self):
+        subscription = Subscription(self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+
+class RedisBroker(MemoryBroker):
+    """Publishes through a Redis channel so every worker process sees every event.
+
+    Each process runs one listener thread (started with its first
+    subscriber) that feeds the channel into the in-process fan-out.
+    """
+
+    def __init__(self, url, channel='slot_events', queue_size=256):
+        super().__init__(queue_size)
+        self.channel = channel
+        self._redis = redis.Redis.from_url(url)
+        self._listener = None
+
+    def publish(self, event):
+        self._redis.publish(self.channel, json.dumps(event))
+
+    def subscribe(self):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name='slot-events', daemon=True)
+                self._listener.start()
+        return super().subscribe()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for message in pubsub.listen():
+                    self.deliver(json.loads(message['data']))
+            except redis.RedisError as e:
+                logger.warning("Slot events listener lost Redis (%s), reconnecting", e)
+                _time.sleep(1)
+
+
+class SlotEvents:
+    """Live slot-change events for GET /api/appointments/events/.
+
+    Publishing is best effort and never fails the write that triggered it:
+    clients re-sync from the regular endpoints when they (re)connect.
+    """
+
+    def __init__(self):
+        self.broker = MemoryBroker()
+
+    def init_app(self, app):
+        queue_size = app.config.get('SLOT_EVENTS_QUEUE_SIZE', 256)
+        url = app.config.get('SLOT_EVENTS_REDIS_URL')
+        if url and redis is None:
+            logger.warning("SLOT_EVENTS_REDIS_URL is set but the redis package is not installed; "
+                           "slot events stay within each worker process")
+        if url and redis is not None:
+            self.broker = RedisBroker(url, queue_size=queue_size)
+        else:
+            self.broker = MemoryBroker(queue_size)
+
+    def publish(self, *events):
+        for event in events:
+            try:
+                self.broker.publish(event)
+            except Exception as e:
+                logger.warning("Could not publish slot event %s: %s", event, e)
+
+    def subscribe(self):
+        return self.broker.subscribe()
+
+    def unsubscribe(self, subscription):
+        self.broker.unsubscribe(subscription)
+
+
+slot_events = SlotEvents()
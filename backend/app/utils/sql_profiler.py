@@ -0,0 +1,125 @@
+import logging
+import re
+import time as _time
+
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Runs of bind placeholders, e.g. the expanded list of an IN clause: (?, ?, ?) / (%(p_1)s, %(p_2)s)
+_PLACEHOLDER_RUN = re.compile(r'\(\s*(?:\?|%\(\w+\)s|%s|:\w+)(?:\s*,\s*(?:\?|%\(\w+\)s|%s|:\w+))*\s*\)')
+
+# Tables whose parameters are never logged: password hashes, token ids, customer names and phones
+_SENSITIVE_TABLES = re.compile(r'\b(?:users|revoked_tokens|appointments)\b', re.IGNORECASE)
+
+
+class QueryProfile:
+    """SQL statements of one app context (i.e. one request): count, time and repeats."""
+
+    __slots__ = ('count', 'duration', 'statements')
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = {}  # statement text -> executions
+
+    def shapes(self):
+        """Executions per statement shape; statements that only differ in the length of an IN list count as one."""
+        shapes = {}
+        for statement, count in self.statements.items():
+            shape = _PLACEHOLDER_RUN.sub('(?)', ' '.join(statement.split()))
+            shapes[shape] = shapes.get(shape, 0) + count
+        return shapes
+
+
+def current_profile():
+    profile = g.get('_sql_profile')
+    if profile is None:
+        profile = g._sql_profile = QueryProfile()
+    return profile
+
+
+def query_count():
+    """Number of SQL statements executed in the current app context so far."""
+    profile = g.get('_sql_profile')
+    return profile.count if profile is not None else 0
+
+
+def _truncate(value, limit=500):
+    text = repr(value)
+    return text if len(text) <= limit else text[:limit] + '...'
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_app_context():
+        profile = current_profile()
+        profile.count += 1
+        profile.statements[statement] = profile.statements.get(statement, 0) + 1
+        conn.info.setdefault('_query_started', []).append(_time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('_query_started')
+    if not started or not has_app_context():
+        return
+    elapsed = _time.perf_counter() - started.pop()
+    current_profile().duration += elapsed
+
+    threshold = current_app.config.get('SQL_SLOW_QUERY_MS')
+    if threshold is not None and elapsed * 1000 >= threshold:
+        extra = {'duration_ms': round(elapsed * 1000, 2), 'statement': statement}
+        if current_app.config.get('SQL_SLOW_QUERY_LOG_PARAMS', False):
+            extra['parameters'] = '[redacted]' if _SENSITIVE_TABLES.search(statement) else _truncate(parameters)
+        if has_request_context():
+            extra['endpoint'] = request.endpoint
+        logger.warning('Slow query (%.0f ms)', elapsed * 1000, extra=extra)
+
+
+@event.listens_for(Engine, 'handle_error')
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    connection = exception_context.connection
+    if connection is not None and connection.info.get('_query_started'):
+        connection.info['_query_started'].pop()
+
+
+def init_app(app):
+    """Per-request SQL summary: Server-Timing header and N+1 warnings.
+
+    The engine events above count every statement and its time in the app
+    context (also outside requests, e.g. the image variant threads) and log
+    statements slower than SQL_SLOW_QUERY_MS (with their parameters only if
+    SQL_SLOW_QUERY_LOG_PARAMS, and never for the sensitive tables). At the
+    end of a request the totals go into ``Server-Timing: db;dur=...`` (with
+    SQL_SERVER_TIMING), and a statement shape executed SQL_N_PLUS_ONE_THRESHOLD
+    times or more is logged as a likely N+1 pattern.
+    """
+
+    @app.before_request
+    def start_sql_profile():
+        g._sql_profile = QueryProfile()
+        g._sql_profile_started = _time.perf_counter()
+
+    @app.after_request
+    def finish_sql_profile(response):
+        profile = g.get('_sql_profile')
+        if profile is None:
+            return response
+
+        if app.config.get('SQL_SERVER_TIMING', True):
+            total = (_time.perf_counter() - g.get('_sql_profile_started', _time.perf_counter())) * 1000
+            response.headers.add('Server-Timing', f'db;dur={profile.duration * 1000:.1f};desc="{profile.count} queries"')
+            response.headers.add('Server-Timing', f'total;dur={total:.1f}')
+
+        threshold = app.config.get('SQL_N_PLUS_ONE_THRESHOLD')
+        if threshold and profile.count >= threshold:
+            for shape, count in profile.shapes().items():
+                if count >= threshold:
+                    logger.warning('Possible N+1: statement repeated %d times in %s', count, request.endpoint,
+                                   extra={'statement': shape, 'repeats': count, 'queries': profile.count,
+                                          'endpoint': request.endpoint})
+        return response
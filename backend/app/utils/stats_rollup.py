@@ -0,0 +1,144 @@
+from collections import defaultdict
+
+from sqlalchemy import event, func, inspect, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from .. import db
+from ..models import Appointment, DailyAppointmentStats
+
+ROLLUP_COLUMNS = ('count', 'revenue', 'rating_sum', 'rating_count')
+
+
+def contribution(date, status, service_id, price, rating):
+    """The (key, values) an appointment with these fields adds to the rollup."""
+    key = (date, status or 'pending', service_id)
+    values = (1, float(price or 0), rating or 0, 0 if rating is None else 1)
+    return key, values
+
+
+def add_delta(deltas, key, values, sign=1):
+    current = deltas[key]
+    deltas[key] = tuple(c + sign * v for c, v in zip(current, values))
+
+
+def new_deltas():
+    return defaultdict(lambda: (0, 0.0, 0, 0))
+
+
+def _current_contribution(appointment):
+    return contribution(appointment.date, appointment.status, appointment.service_id,
+                        appointment.price, appointment.client_rating)
+
+
+def _committed_contribution(appointment):
+    state = inspect(appointment)
+
+    def committed(attr):
+        history = state.attrs[attr].history
+        if history.deleted:
+            return history.deleted[0]
+        if history.unchanged:
+            return history.unchanged[0]
+        return getattr(appointment, attr)
+
+    return contribution(committed('date'), committed('status'), committed('service_id'),
+                        committed('price'), committed('client_rating'))
+
+
+def _before_flush(session, flush_context, instances):
+    deltas = new_deltas()
+
+    for obj in session.new:
+        if isinstance(obj, Appointment):
+            add_delta(deltas, *_current_contribution(obj))
+
+    for obj in session.dirty:
+        if isinstance(obj, Appointment) and session.is_modified(obj):
+            old_key, old_values = _committed_contribution(obj)
+            new_key, new_values = _current_contribution(obj)
+            if (old_key, old_values) != (new_key, new_values):
+                add_delta(deltas, old_key, old_values, -1)
+                add_delta(deltas, new_key, new_values)
+
+    for obj in session.deleted:
+        if isinstance(obj, Appointment):
+            add_delta(deltas, *_committed_contribution(obj), -1)
+
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+
+
+def apply_deltas(connection, deltas):
+    """Add ``{(date, status, service_id): (count, revenue, rating_sum, rating_count)}`` to the rollup.
+
+    Increments are applied atomically in SQL, so concurrent transactions
+    touching the same rollup row don't lose updates.
+    """
+    table = DailyAppointmentStats.__table__
+    dialect = connection.dialect.name
+
+    for (date, status, service_id), values in deltas.items():
+        if not any(values):
+            continue
+        increments = dict(zip(ROLLUP_COLUMNS, values))
+
+        if dialect in ('postgresql', 'sqlite'):
+            insert = (postgresql.insert if dialect == 'postgresql' else sqlite.insert)(table)
+            stmt = insert.values(date=date, status=status, service_id=service_id, **increments)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['date', 'status', 'service_id'],
+                set_={column: table.c[column] + stmt.excluded[column] for column in ROLLUP_COLUMNS}
+            )
+            connection.execute(stmt)
+        else:
+            result = connection.execute(
+                update(table)
+                .where(table.c.date == date, table.c.status == status, table.c.service_id == service_id)
+                .values({column: table.c[column] + value for column, value in increments.items()})
+            )
+            if result.rowcount == 0:
+                connection.execute(table.insert().values(
+                    date=date, status=status, service_id=service_id, **increments
+                ))
+
+
+def rebuild(start_date=None, end_date=None, connection=None):
+    """Recompute the rollup from the appointments table, optionally for a date range only.
+
+    Runs in the session and commits, or on ``connection`` (a migration), leaving the commit to the caller.
+    """
+    table = DailyAppointmentStats.__table__
+    appointments = Appointment.__table__
+
+    delete = table.delete()
+    source = select(
+        appointments.c.date,
+        func.coalesce(appointments.c.status, 'pending'),
+        appointments.c.service_id,
+        func.count(),
+        func.coalesce(func.sum(appointments.c.price), 0),
+        func.coalesce(func.sum(appointments.c.client_rating), 0),
+        func.count(appointments.c.client_rating)
+    ).group_by(appointments.c.date, func.coalesce(appointments.c.status, 'pending'), appointments.c.service_id)
+
+    if start_date:
+        delete = delete.where(table.c.date >= start_date)
+        source = source.where(appointments.c.date >= start_date)
+    if end_date:
+        delete = delete.where(table.c.date <= end_date)
+        source = source.where(appointments.c.date <= end_date)
+
+    insert = table.insert().from_select(['date', 'status', 'service_id'] + list(ROLLUP_COLUMNS), source)
+    if connection is not None:
+        connection.execute(delete)
+        return connection.execute(insert).rowcount
+
+    db.session.execute(delete)
+    result = db.session.execute(insert)
+    db.session.commit()
+    return result.rowcount
+
+
+def init_app(app):
+    if not event.contains(db.session, 'before_flush', _before_flush):
+        event.listen(db.session, 'before_flush', _before_flush)
@@ -0,0 +1,164 @@
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+import time as _time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import g, has_request_context, request
+from flask.logging import default_handler
+
+# Everything under the `app` package (routes, utils, and Flask's app.logger) logs through here
+ROOT_LOGGER = 'app'
+
+# LogRecord attributes; anything else on a record came in through `extra=`
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+logger = logging.getLogger(__name__)
+access_logger = logging.getLogger(ROOT_LOGGER + '.access')
+
+_listener = None
+_handler = None
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, request fields and ``extra=`` fields."""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines for local development (LOG_FORMAT = 'text')."""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    def format(self, record):
+        line = super().format(record)
+        extra = {key: value for key, value in record.__dict__.items()
+                 if key not in _RECORD_ATTRS and not key.startswith('_')}
+        if extra:
+            line += ' ' + ' '.join(f'{key}={value}' for key, value in extra.items())
+        return line
+
+
+class RequestContextFilter(logging.Filter):
+    """Adds the request id / method / path, and drops sub-WARNING records of unsampled requests."""
+
+    def filter(self, record):
+        if not has_request_context():
+            return True
+        if record.levelno < logging.WARNING and not g.get('_log_sampled', True):
+            return False
+        record.request_id = g.get('_request_id')
+        record.method = request.method
+        record.path = request.path
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Never blocks the request: when the writer falls behind, records are dropped and counted."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _sample_rate(app, endpoint):
+    return app.config.get('LOG_ROUTE_SAMPLE_RATES', {}).get(endpoint, app.config.get('LOG_SAMPLE_RATE', 1.0))
+
+
+def dropped_records():
+    """Records dropped so far because the queue was full."""
+    return _handler.dropped if _handler is not None else 0
+
+
+def _stop():
+    global _listener, _handler
+    if _listener is not None:
+        _listener.stop()
+    if _handler is not None:
+        logging.getLogger(ROOT_LOGGER).removeHandler(_handler)
+    _listener = _handler = None
+
+
+# Flush what is still queued on shutdown
+atexit.register(_stop)
+
+
+def init_app(app):
+    """Route the `app` loggers through a bounded queue to a background writer, and log each request.
+
+    Records are formatted in the calling thread (cheap) and written to
+    stderr by a QueueListener thread, so a slow terminal or log collector
+    never stalls a worker. Per request, one sampling decision is made from
+    LOG_ROUTE_SAMPLE_RATES / LOG_SAMPLE_RATE: unsampled requests drop their
+    DEBUG/INFO records (access line included) but keep warnings and errors.
+    The request body is only logged with LOG_REQUEST_BODY, and only for
+    small non-multipart bodies.
+    """
+    global _listener, _handler
+    _stop()
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    # The queue handler formats; the listener writes the finished line as is
+    stream_handler.setFormatter(logging.Formatter('%(message)s'))
+
+    _handler = DroppingQueueHandler(queue.Queue(app.config.get('LOG_QUEUE_SIZE', 10000)))
+    _handler.setFormatter(TextFormatter() if app.config.get('LOG_FORMAT') == 'text' else JSONFormatter())
+    _handler.addFilter(RequestContextFilter())
+
+    root = logging.getLogger(ROOT_LOGGER)
+    root.removeHandler(default_handler)
+    root.addHandler(_handler)
+    root.setLevel(app.config.get('LOG_LEVEL', 'INFO'))
+    root.propagate = False
+
+    _listener = QueueListener(_handler.queue, stream_handler)
+    _listener.start()
+
+    @app.before_request
+    def start_request_log():
+        g._request_started = _time.perf_counter()
+        g._request_id = request.headers.get('X-Request-ID', '')[:64] or uuid.uuid4().hex[:16]
+        g._log_sampled = random.random() < _sample_rate(app, request.endpoint)
+
+        if app.config.get('LOG_REQUEST_BODY') and g._log_sampled and logger.isEnabledFor(logging.DEBUG):
+            length = request.content_length or 0
+            if 0 < length <= app.config.get('LOG_REQUEST_BODY_MAX', 2048) and request.mimetype != 'multipart/form-data':
+                logger.debug('Request body', extra={'body': request.get_data(as_text=True)})
+
+    @app.after_request
+    def finish_request_log(response):
+        started = g.pop('_request_started', None)
+        if started is not None:
+            access_logger.info('%s %s %s', request.method, request.path, response.status_code, extra={
+                'endpoint': request.endpoint,
+                'status': response.status_code,
+                'duration_ms': round((_time.perf_counter() - started) * 1000, 2),
+            })
+        if g.get('_request_id'):
+            response.headers['X-Request-ID'] = g._request_id
+        return response
@@ -0,0 +1,204 @@
+import hashlib
+import threading
+import time as _time
+from datetime import datetime, timedelta, timezone
+
+from .. import db
+from ..models import RevokedToken, User
+
+_POLL_OVERLAP = timedelta(seconds=5)
+
+
+class BloomFilter:
+    """Fixed-size set of strings that can answer "definitely not in" without storing them.
+
+    ``key in bloom`` is never False for an added key; it is True for a key
+    that wasn't added with a small probability that grows with the number
+    of keys (about 1% for ``size_bits / 10`` keys with 7 hashes).
+    """
+
+    def __init__(self, size_bits, hashes):
+        self.size_bits = size_bits
+        self.hashes = hashes
+        self._bits = bytearray((size_bits + 7) // 8)
+
+    def _positions(self, key):
+        # Two 64-bit hashes combined into `hashes` positions (Kirsch-Mitzenmacher)
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size_bits for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+def _timestamp(value):
+    """Naive UTC datetime (as stored in the database) -> epoch seconds"""
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+class TokenRevocation:
+    """Revoked JWTs, checked on every protected request without a query.
+
+    Two kinds of revocation are kept in the database and mirrored in memory:
+    - single tokens (logout), as RevokedToken rows keyed by ``jti``, fronted
+      by a Bloom filter; only a filter hit, i.e. a revoked token or a rare
+      false positive, is confirmed with a primary-key lookup
+    - every token of a user issued before ``users.tokens_valid_after``
+      (password change), as a user id -> cutoff dict
+
+    Every ``sync_interval`` seconds the filter is rebuilt from the rows that
+    haven't expired yet, so it doesn't fill up with dead tokens; expired rows
+    are deleted whenever a token is revoked. In between, every
+    ``poll_interval`` seconds only the revocations made since the last check
+    are read (two small indexed queries). A token revoked by another worker
+    therefore keeps working here for up to ``poll_interval`` seconds - that
+    window remains; in the revoking worker itself it is rejected at once.
+    """
+
+    def __init__(self, sync_interval=60, poll_interval=2, bloom_bits=1 << 20, bloom_hashes=7):
+        self.enabled = False
+        self.sync_interval = sync_interval
+        self.poll_interval = poll_interval
+        self.bloom_bits = bloom_bits
+        self.bloom_hashes = bloom_hashes
+        self.token_lifetime = None
+        self._bloom = BloomFilter(bloom_bits, bloom_hashes)
+        self._cutoffs = {}  # str(user_id) -> epoch seconds
+        self._local = {}  # jti -> exp of tokens revoked by this worker, re-added on every sync
+        self._synced_at = None
+        self._polled_at = None
+        self._poll_since = None  # database time the next poll reads revocations from
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+
+    def init_app(self, app):
+        self.enabled = app.config.get('JWT_BLACKLIST_ENABLED', False)
+        self.sync_interval = app.config.get('TOKEN_REVOCATION_SYNC_INTERVAL', self.sync_interval)
+        self.poll_interval = app.config.get('TOKEN_REVOCATION_POLL_INTERVAL', self.poll_interval)
+        self.bloom_bits = app.config.get('TOKEN_REVOCATION_BLOOM_BITS', self.bloom_bits)
+        self.bloom_hashes = app.config.get('TOKEN_REVOCATION_BLOOM_HASHES', self.bloom_hashes)
+        self.token_lifetime = app.config.get('JWT_ACCESS_TOKEN_EXPIRES')
+        self._synced_at = None
+
+    def sync(self):
+        """Rebuild the filter and the user cutoffs from the database, leaving out expired entries."""
+        now = datetime.utcnow()
+        bloom = BloomFilter(self.bloom_bits, self.bloom_hashes)
+        query = db.session.query(RevokedToken.jti).filter(RevokedToken.expires_at > now)
+        for (jti,) in query.yield_per(1000):
+            bloom.add(jti)
+
+        query = db.session.query(User.id, User.tokens_valid_after).filter(User.tokens_valid_after.isnot(None))
+        if self.token_lifetime:
+            # Older cutoffs can't reject anything: every token issued before them has expired
+            query = query.filter(User.tokens_valid_after > now - self.token_lifetime)
+        cutoffs = {str(user_id): _timestamp(valid_after) for user_id, valid_after in query}
+
+        horizon = _timestamp(now - self.token_lifetime) if self.token_lifetime else 0
+        with self._lock:
+            # Revocations of this worker may have committed after the queries above
+            self._local = {jti: exp for jti, exp in self._local.items() if exp > _time.time()}
+            for jti in self._local:
+                bloom.add(jti)
+            for user_id, cutoff in self._cutoffs.items():
+                if cutoff > max(cutoffs.get(user_id, 0), horizon):
+                    cutoffs[user_id] = cutoff
+            self._bloom = bloom
+            self._cutoffs = cutoffs
+            self._synced_at = self._polled_at = _time.monotonic()
+            self._poll_since = now
+
+    def poll(self):
+        """Add the revocations committed since the last sync / poll to the current filter and cutoffs."""
+        now = datetime.utcnow()
+        # revoked_at is set before the revoking transaction commits; the overlap
+        # catches rows that became visible late (re-adding one is harmless)
+        since = self._poll_since - _POLL_OVERLAP
+        jtis = [jti for (jti,) in db.session.query(RevokedToken.jti).filter(RevokedToken.revoked_at >= since)]
+        users = db.session.query(User.id, User.tokens_valid_after).filter(User.tokens_valid_after >= since).all()
+
+        with self._lock:
+            for jti in jtis:
+                self._bloom.add(jti)
+            for user_id, valid_after in users:
+                cutoff = _timestamp(valid_after)
+                if cutoff > self._cutoffs.get(str(user_id), 0):
+                    self._cutoffs[str(user_id)] = cutoff
+            self._polled_at = _time.monotonic()
+            self._poll_since = now
+
+    def _maybe_sync(self):
+        synced_at, polled_at = self._synced_at, self._polled_at
+        now = _time.monotonic()
+        if synced_at is not None and now - polled_at < self.poll_interval:
+            return
+        # Only one thread reads; the others keep using the current filter,
+        # except before the first sync, when there is nothing to use yet
+        if not self._sync_lock.acquire(blocking=synced_at is None):
+            return
+        try:
+            if self._synced_at is synced_at and self._polled_at is polled_at:
+                if synced_at is None or now - synced_at >= self.sync_interval:
+                    self.sync()
+                else:
+                    self.poll()
+        finally:
+            self._sync_lock.release()
+
+    def is_revoked(self, jwt_payload):
+        if not self.enabled:
+            return False
+        self._maybe_sync()
+
+        cutoff = self._cutoffs.get(str(jwt_payload.get('sub')))
+        if cutoff is not None and jwt_payload.get('iat', 0) < cutoff:
+            return True
+
+        jti = jwt_payload.get('jti')
+        if jti is None or jti not in self._bloom:
+            return False
+        # Either revoked or a false positive of the filter
+        return db.session.get(RevokedToken, jti) is not None
+
+    def revoke(self, jwt_payload):
+        """Revoke one token (logout). Commits the session."""
+        jti = jwt_payload['jti']
+        exp = jwt_payload.get('exp')
+        if exp is None:
+            exp = _time.time() + (self.token_lifetime.total_seconds() if self.token_lifetime else 0)
+        now = datetime.utcnow()
+
+        if db.session.get(RevokedToken, jti) is None:
+            sub = jwt_payload.get('sub')
+            db.session.add(RevokedToken(
+                jti=jti,
+                user_id=int(sub) if sub and str(sub).isdigit() else None,
+                expires_at=datetime.fromtimestamp(exp, timezone.utc).replace(tzinfo=None)
+            ))
+        # Compaction: an expired token is rejected anyway, its row is no longer needed
+        RevokedToken.query.filter(RevokedToken.expires_at <= now).delete(synchronize_session=False)
+        db.session.commit()
+
+        with self._lock:
+            self._bloom.add(jti)
+            self._local[jti] = exp
+
+    def revoke_user_tokens(self, user):
+        """Reject every token of ``user`` issued until now. The caller commits, then calls ``user_tokens_revoked``."""
+        # Whole seconds, like the token's `iat`, so a login right after this isn't caught by it
+        user.tokens_valid_after = datetime.utcnow().replace(microsecond=0)
+
+    def user_tokens_revoked(self, user):
+        if user.tokens_valid_after is None:
+            return
+        with self._lock:
+            self._cutoffs[str(user.id)] = _timestamp(user.tokens_valid_after)
+
+
+token_revocation = TokenRevocation()
@@ -0,0 +1,125 @@
+import json
+import os
+import time as _time
+
+from .. import db
+from ..models import GalleryImage
+from .gallery_storage import UPLOAD_URL, upload_folder
+
+# Shard '' is the top level of the uploads folder: files from before
+# content-addressed storage, and temp files of interrupted uploads
+ROOT_SHARD = ''
+
+
+def list_shards():
+    folder = upload_folder()
+    if not os.path.isdir(folder):
+        return []
+    shards = sorted(entry.name for entry in os.scandir(folder)
+                    if entry.is_dir() and len(entry.name) == 2)
+    return [ROOT_SHARD] + shards
+
+
+def referenced_urls(shard, batch_size=500):
+    """URLs of the originals and variants that gallery images in ``shard`` point to."""
+    query = db.session.query(GalleryImage.file_path, GalleryImage.variants)
+    if shard == ROOT_SHARD:
+        query = query.filter(GalleryImage.content_hash.is_(None))
+    else:
+        query = query.filter(GalleryImage.file_path.like(f'{UPLOAD_URL}/{shard}/%'))
+
+    urls = set()
+    for file_path, variants in query.yield_per(batch_size):
+        urls.add(file_path)
+        urls.update(variant['url'] for variant in variants or [])
+    return urls
+
+
+def _files(shard):
+    folder = upload_folder()
+    if shard == ROOT_SHARD:
+        for entry in os.scandir(folder):
+            if entry.is_file():
+                yield entry
+        return
+    stack = [os.path.join(folder, shard)]
+    while stack:
+        for entry in os.scandir(stack.pop()):
+            if entry.is_dir():
+                stack.append(entry.path)
+            elif entry.is_file():
+                yield entry
+
+
+def collect_shard(shard, grace_seconds, dry_run=False):
+    """Remove files of one shard that no gallery image references and are older than the grace period."""
+    folder = upload_folder()
+    # Read the references first: anything stored after this is newer than the grace period
+    referenced = referenced_urls(shard)
+    db.session.rollback()
+    cutoff = _time.time() - grace_seconds
+    report = {'shard': shard or '/', 'scanned': 0, 'removed': 0, 'reclaimed_bytes': 0}
+
+    for entry in _files(shard):
+        report['scanned'] += 1
+        url = f"{UPLOAD_URL}/{os.path.relpath(entry.path, folder).replace(os.sep, '/')}"
+        stat = entry.stat()
+        if url in referenced or stat.st_mtime > cutoff:
+            continue
+        if not dry_run:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+        report['removed'] += 1
+        report['reclaimed_bytes'] += stat.st_size
+
+    if not dry_run and shard != ROOT_SHARD:
+        _remove_empty_dirs(os.path.join(folder, shard))
+    return report
+
+
+def _remove_empty_dirs(path):
+    for root, _, _ in os.walk(path, topdown=False):
+        if not os.listdir(root):
+            try:
+                os.rmdir(root)
+            except OSError:
+                pass  # a new upload just arrived
+
+
+def collect(state_path, max_shards=None, grace_seconds=24 * 60 * 60, dry_run=False):
+    """Garbage-collect up to ``max_shards`` shards, continuing where the previous run stopped.
+
+    The position is kept in ``state_path`` so that repeated runs (e.g. from
+    cron) cycle through the uploads folder a few shards at a time instead of
+    scanning everything at once.
+    """
+    shards = list_shards()
+    position = None
+    if os.path.exists(state_path):
+        with open(state_path) as f:
+            position = json.load(f).get('next_shard')
+
+    start = 0
+    if position is not None:
+        # The first shard after the one we stopped at, even if that one is gone by now
+        start = next((i for i, shard in enumerate(shards) if shard >= position), 0)
+    count = len(shards) if max_shards is None else min(max_shards, len(shards))
+    batch = [shards[(start + i) % len(shards)] for i in range(count)] if shards else []
+
+    reports = [collect_shard(shard, grace_seconds, dry_run) for shard in batch]
+
+    if batch and not dry_run:
+        next_shard = shards[(start + count) % len(shards)]
+        os.makedirs(os.path.dirname(state_path), exist_ok=True)
+        with open(state_path, 'w') as f:
+            json.dump({'next_shard': next_shard}, f)
+
+    return {
+        'shards': reports,
+        'scanned': sum(r['scanned'] for r in reports),
+        'removed': sum(r['removed'] for r in reports),
+        'reclaimed_bytes': sum(r['reclaimed_bytes'] for r in reports),
+        'dry_run': dry_run
+    }
@@ -0,0 +1,122 @@
+import hashlib
+import os
+import tempfile
+
+from flask import Request, current_app
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+
+# Leading bytes of the accepted image formats -> stored extension
+MAGIC_BYTES = (
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+)
+MAGIC_LENGTH = max(len(magic) for magic, _ in MAGIC_BYTES)
+
+
+def image_upload(f):
+    """Mark a view whose uploaded files are images to stream through ImageUploadStream."""
+    f.image_upload = True
+    return f
+
+
+class ImageUploadStream:
+    """Write target for one uploaded image part.
+
+    The multipart parser hands the body over in small chunks; they go
+    straight to a temporary file next to the uploads while being hashed, so
+    memory use per upload stays at one chunk. The upload is rejected as
+    soon as its first bytes aren't a known image format or it grows past
+    ``max_size``. ``persist(path)`` moves the finished file into place.
+    """
+
+    def __init__(self, folder, max_size):
+        os.makedirs(folder, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(dir=folder, suffix='.tmp')
+        self.file = os.fdopen(fd, 'w+b')
+        self.max_size = max_size
+        self.size = 0
+        self.extension = None
+        self._sha256 = hashlib.sha256()
+        self._head = b''
+
+    @property
+    def content_hash(self):
+        return self._sha256.hexdigest()
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_size:
+            self.close()
+            raise RequestEntityTooLarge(f'Image is larger than {round(self.max_size / (1024 * 1024), 1):g} MB')
+        if self.extension is None:
+            self._head += data[:MAGIC_LENGTH]
+            if len(self._head) >= MAGIC_LENGTH:
+                self._detect()
+        self._sha256.update(data)
+        return self.file.write(data)
+
+    def _detect(self):
+        for magic, extension in MAGIC_BYTES:
+            if self._head.startswith(magic):
+                self.extension = extension
+                return
+        self.close()
+        raise UnsupportedMediaType('The file is not a PNG, JPEG or GIF image')
+
+    def seek(self, offset, whence=0):
+        # Called by the parser once the part is complete
+        if self.extension is None:
+            self._detect()
+        return self.file.seek(offset, whence)
+
+    def read(self, size=-1):
+        return self.file.read(size)
+
+    def tell(self):
+        return self.file.tell()
+
+    def persist(self, path):
+        """Atomically move the upload to ``path``; returns False if ``path`` already exists."""
+        self.file.close()
+        if os.path.exists(path):
+            return False
+        os.chmod(self.path, 0o644)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(self.path, path)
+        self.path = None
+        return True
+
+    def close(self):
+        self.file.close()
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+        self.path = None
+
+    def __getattr__(self, name):
+        if name == 'file':
+            raise AttributeError(name)
+        return getattr(self.file, name)
+
+
+class UploadRequest(Request):
+    """Streams file parts of @image_upload views through ImageUploadStream."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        view = current_app.view_functions.get(self.endpoint) if self.endpoint else None
+        if not getattr(view, 'image_upload', False):
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+
+        stream = ImageUploadStream(
+            current_app.config['UPLOAD_FOLDER'],
+            current_app.config.get('MAX_IMAGE_UPLOAD_SIZE', 10 * 1024 * 1024)
+        )
+        # Closed with the request even if parsing fails half way through the body
+        self.__dict__.setdefault('_upload_streams', []).append(stream)
+        return stream
+
+    def close(self):
+        super().close()
+        for stream in self.__dict__.pop('_upload_streams', []):
+            stream.close()
@@ -0,0 +1,155 @@
+"""Fire many parallel bookings at the same day and check that none overlap.
+
+Usage:
+    python bench_booking.py                      # in-process, Flask test client
+    python bench_booking.py --url http://localhost:5000/api   # against a running server
+    python bench_booking.py --requests 500 --concurrency 100
+
+Uses the database from DATABASE_URL. Benchmark bookings are created on a
+far-future open day and removed afterwards unless --keep is given.
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from app import create_app, db
+from app.models import Appointment, BusinessHours, Service
+from app.utils.scheduling import format_minutes, to_minutes
+
+
+def find_open_day(years_ahead=10):
+    """First open day roughly ``years_ahead`` years from now, with its hours."""
+    hours_by_day = {hours.day_of_week: hours for hours in BusinessHours.query.all() if hours.is_open}
+    if not hours_by_day:
+        raise SystemExit('No open business hours configured - run seed_business_hours.py first')
+
+    day = date.today() + timedelta(days=365 * years_ahead)
+    while day.weekday() not in hours_by_day:
+        day += timedelta(days=1)
+    return day, hours_by_day[day.weekday()]
+
+
+def find_overlaps(appointments):
+    overlaps = []
+    latest = None
+    for appointment in sorted(appointments, key=lambda a: (a.start_time, a.end_time)):
+        if latest is not None and appointment.start_time < latest.end_time:
+            overlaps.append((latest.id, appointment.id))
+        if latest is None or appointment.end_time > latest.end_time:
+            latest = appointment
+    return overlaps
+
+
+def make_sender(app, url):
+    if url:
+        def send(payload):
+            request = urllib.request.Request(
+                url.rstrip('/') + '/appointments/',
+                data=json.dumps(payload).encode(),
+                headers={'Content-Type': 'application/json'},
+                method='POST'
+            )
+            try:
+                with urllib.request.urlopen(request, timeout=30) as response:
+                    return response.status
+            except urllib.error.HTTPError as e:
+                return e.code
+        return send
+
+    def send(payload):
+        with app.test_client() as client:
+            return client.post('/api/appointments/', json=payload).status_code
+    return send
+
+
+def run_benchmark(requests_count, concurrency, url=None, keep=False):
+    app = create_app()
+
+    with app.app_context():
+        day, hours = find_open_day()
+        service = Service.query.order_by(Service.duration).first()
+        if not service:
+            raise SystemExit('No services configured - run seed_services.py first')
+        service_id, duration = service.id, service.duration
+
+        open_minute, close_minute = to_minutes(hours.open_time), to_minutes(hours.close_time)
+        # A 15 minute grid with longer services makes neighbouring requests collide
+        starts = list(range(open_minute, close_minute - duration + 1, 15))
+
+    run_id = uuid.uuid4().hex[:8]
+    payloads = [{
+        'service_id': service_id,
+        'name': f'bench-{run_id}',
+        'phone': '0000000000',
+        'date': day.isoformat(),
+        'start_time': format_minutes(random.choice(starts))
+    } for _ in range(requests_count)]
+
+    send = make_sender(app, url)
+    latencies = []
+
+    def timed(payload):
+        started = time.perf_counter()
+        status = send(payload)
+        latencies.append(time.perf_counter() - started)
+        return status
+
+    print(f"Booking {requests_count} appointments on {day} "
+          f"({len(starts)} candidate starts, {duration} min service, concurrency {concurrency})")
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        statuses = list(pool.map(timed, payloads))
+    elapsed = time.perf_counter() - started
+
+    counts = {}
+    for status in statuses:
+        counts[status] = counts.get(status, 0) + 1
+
+    latencies.sort()
+    print(f"Elapsed:     {elapsed:.2f}s")
+    print(f"Throughput:  {requests_count / elapsed:.1f} requests/s")
+    print(f"Latency:     p50 {statistics.median(latencies) * 1000:.1f} ms, "
+          f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f} ms, "
+          f"max {latencies[-1] * 1000:.1f} ms")
+    print(f"Statuses:    {dict(sorted(counts.items()))}")
+
+    with app.app_context():
+        day_appointments = Appointment.query.filter_by(date=day).all()
+        booked = [a for a in day_appointments if a.name == f'bench-{run_id}']
+        overlaps = find_overlaps(day_appointments)
+
+        print(f"Accepted:    {counts.get(201, 0)} responses, {len(booked)} rows stored")
+        ok = not overlaps and counts.get(201, 0) == len(booked)
+        if overlaps:
+            print(f"FAIL: {len(overlaps)} overlapping pairs, e.g. {overlaps[:5]}")
+        elif not ok:
+            print("FAIL: accepted responses don't match stored rows")
+        else:
+            print("OK: no overlapping bookings")
+
+        if not keep:
+            for appointment in booked:
+                db.session.delete(appointment)
+            db.session.commit()
+
+    return ok
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Concurrent booking benchmark')
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--url', help='API base URL of a running server, e.g. http://localhost:5000/api')
+    parser.add_argument('--keep', action='store_true', help='keep the benchmark bookings')
+    args = parser.parse_args()
+
+    if not run_benchmark(args.requests, args.concurrency, args.url, args.keep):
+        raise SystemExit(1)
@@ -0,0 +1,93 @@
+"""Check with EXPLAIN that every hot query is served by its index.
+
+Usage:
+    python explain_indexes.py
+
+Run after migrate.py. On PostgreSQL sequential scans are disabled for the
+check, so small development tables still prove that the index *can* serve
+the query rather than whatever the planner prefers for ten rows. Exits with
+status 1 if any query doesn't use its expected index.
+"""
+from datetime import date, time
+
+from sqlalchemy import func, select, text, tuple_
+
+from app import create_app, db
+from app.models import Appointment, DailyAppointmentStats, GalleryImage
+from app.models.review import Review
+
+DAY = date(2030, 1, 7)
+
+def hot_queries():
+    """(description, statement, expected index name or None for any index)"""
+    return [
+        ('load_day_schedules: appointments for a date range',
+         select(Appointment.id, Appointment.date, Appointment.start_time, Appointment.end_time)
+         .where(Appointment.date >= DAY, Appointment.date <= DAY),
+         'ix_appointments_date_start_time_id'),
+        ('get_appointments: keyset page',
+         select(Appointment)
+         .where(tuple_(Appointment.date, Appointment.start_time, Appointment.id) > tuple_(DAY, time(10, 0), 5))
+         .order_by(Appointment.date, Appointment.start_time, Appointment.id)
+         .limit(51),
+         'ix_appointments_date_start_time_id'),
+        ('get_appointments: status filter',
+         select(Appointment.id).where(Appointment.status == 'cancelled', Appointment.date >= DAY),
+         'ix_appointments_status_date'),
+        ('delete_service: appointments for a service',
+         select(func.count()).select_from(Appointment).where(Appointment.service_id == 1),
+         'ix_appointments_service_id'),
+        ('get_reviews: approved, newest first',
+         select(Review).where(Review.is_approved == True).order_by(Review.created_at.desc()),
+         'ix_reviews_is_approved_created_at'),
+        ('get_admin_reviews: newest first',
+         select(Review).order_by(Review.created_at.desc()),
+         'ix_reviews_created_at'),
+        ('get_gallery_images: newest first',
+         select(GalleryImage).order_by(GalleryImage.created_at.desc(), GalleryImage.id.desc()),
+         'ix_gallery_images_created_at_id'),
+        ('get_appointment_stats: rollup for a date range',
+         select(DailyAppointmentStats.status, func.sum(DailyAppointmentStats.count))
+         .where(DailyAppointmentStats.date >= DAY, DailyAppointmentStats.date <= DAY)
+         .group_by(DailyAppointmentStats.status),
+         None),
+    ]
+
+def explain(connection, statement):
+    sql = str(statement.compile(dialect=connection.dialect, compile_kwargs={'literal_binds': True}))
+    if connection.dialect.name == 'postgresql':
+        rows = connection.execute(text('EXPLAIN ' + sql)).fetchall()
+        return '\n'.join(row[0] for row in rows)
+    rows = connection.execute(text('EXPLAIN QUERY PLAN ' + sql)).fetchall()
+    return '\n'.join(row[-1] for row in rows)
+
+def uses_index(plan, expected):
+    if expected is not None:
+        return expected in plan
+    return 'Index' in plan or 'INDEX' in plan or 'PRIMARY KEY' in plan
+
+def explain_indexes():
+    app = create_app()
+    failures = 0
+    
+    with app.app_context():
+        with db.engine.connect() as connection:
+            if connection.dialect.name == 'postgresql':
+                connection.execute(text('SET enable_seqscan = off'))
+            
+            for description, statement, expected in hot_queries():
+                plan = explain(connection, statement)
+                ok = uses_index(plan, expected)
+                failures += not ok
+                print(f"[{'PASS' if ok else 'FAIL'}] {description} -> {expected or 'any index'}")
+                if not ok:
+                    print('    ' + plan.replace('\n', '\n    '))
+            
+            connection.rollback()
+    
+    print(f"{len(hot_queries()) - failures} of {len(hot_queries())} hot queries use their index.")
+    return failures == 0
+
+if __name__ == '__main__':
+    if not explain_indexes():
+        raise SystemExit(1)
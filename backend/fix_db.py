@@ -2,6 +2,7 @@ from app import create_app, db
 from app.models import Service, BusinessHours, Appointment
 from datetime import time
 from sqlalchemy import text
+from app.utils.reference_cache import BUSINESS_HOURS, SERVICES, reference_cache
 
 app = create_app()
 
@@ -23,6 +24,7 @@ with app.app_context():
     # Add price column to services table if it doesn't exist
     try:
         db.session.execute(text("ALTER TABLE services ADD COLUMN IF NOT EXISTS price FLOAT DEFAULT 0.0"))
+        reference_cache.bump(SERVICES)
         db.session.commit()
         print("Added price column to services table")
     except Exception as e:
@@ -80,7 +82,8 @@ with app.app_context():
         for service in other_services:
             db.session.delete(service)
             print(f"Deleted service {service.id}: {service.name}")
-            
+        
+        reference_cache.bump(SERVICES)
         db.session.commit()
         print("Services updated successfully")
     except Exception as e:
@@ -99,6 +102,7 @@ with app.app_context():
                 close_time=time(20, 0)
             ))
         
+        reference_cache.bump(BUSINESS_HOURS)
         db.session.commit()
         print("Set business hours to 9:00-20:00")
     except Exception as e:
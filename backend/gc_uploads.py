@@ -0,0 +1,31 @@
+import argparse
+import os
+
+from app import create_app
+from app.utils import upload_gc
+
+def gc_uploads(shards=None, grace_hours=24, dry_run=False):
+    """Remove uploaded files that no gallery image references any more"""
+    app = create_app()
+    
+    with app.app_context():
+        state_path = os.path.join(app.instance_path, 'upload_gc.json')
+        report = upload_gc.collect(state_path, shards, grace_hours * 60 * 60, dry_run)
+        
+        prefix = "[dry run] " if dry_run else ""
+        for shard in report['shards']:
+            if shard['removed']:
+                print(f"  {shard['shard']}: {shard['removed']} of {shard['scanned']} files, "
+                      f"{shard['reclaimed_bytes']} bytes")
+        print(f"{prefix}Scanned {len(report['shards'])} shards, {report['scanned']} files: "
+              f"removed {report['removed']} orphans, reclaimed {report['reclaimed_bytes'] / (1024 * 1024):.1f} MB.")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Garbage-collect orphaned gallery uploads')
+    parser.add_argument('--shards', type=int, default=16,
+                        help='shards (upload subfolders) to scan this run, continuing from the last run; 0 = all')
+    parser.add_argument('--grace-hours', type=float, default=24, help='keep orphans younger than this')
+    parser.add_argument('--dry-run', action='store_true', help='only report what would be removed')
+    args = parser.parse_args()
+    
+    gc_uploads(args.shards or None, args.grace_hours, args.dry_run)
@@ -0,0 +1,43 @@
+import argparse
+
+from app import create_app, db
+from app.models import GalleryImage
+from app.utils.gallery_storage import remove_variants
+from app.utils.image_variants import image_variants
+from app.utils.reference_cache import GALLERY, reference_cache
+
+def generate_image_variants(regenerate=False):
+    """Create the resized / WebP variants for gallery images uploaded before they existed"""
+    app = create_app()
+    
+    with app.app_context():
+        if not image_variants.available:
+            print("Pillow is not installed (pip install Pillow).")
+            return
+        
+        query = GalleryImage.query.order_by(GalleryImage.id)
+        if not regenerate:
+            query = query.filter(GalleryImage.variants.is_(None))
+        
+        done = 0
+        for image in query.all():
+            try:
+                if regenerate:
+                    remove_variants(image.variants)
+                image.variants = image_variants.generate(image.file_path)
+                reference_cache.bump(GALLERY)
+                db.session.commit()
+                done += 1
+                print(f"Image {image.id}: {len(image.variants)} variants")
+            except Exception as e:
+                db.session.rollback()
+                print(f"Image {image.id} ({image.file_path}) skipped: {str(e)}")
+        
+        print(f"Generated variants for {done} images.")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate gallery image variants')
+    parser.add_argument('--regenerate', action='store_true', help='also redo images that already have variants')
+    args = parser.parse_args()
+    
+    generate_image_variants(args.regenerate)
@@ -0,0 +1,37 @@
+import argparse
+
+from app import create_app
+from app.utils.bulk_import import import_appointments, read_rows
+
+def import_file(path, enforce_business_hours=True, dry_run=False, chunk_size=None):
+    """Import appointments from a .csv, .ndjson or .json file"""
+    app = create_app()
+    
+    with app.app_context():
+        with open(path, 'rb') as f:
+            rows = read_rows(f, path)
+        
+        report = import_appointments(
+            rows,
+            chunk_size=chunk_size or app.config.get('IMPORT_CHUNK_SIZE', 500),
+            enforce_business_hours=enforce_business_hours,
+            dry_run=dry_run
+        )
+        
+        prefix = "[dry run] " if dry_run else ""
+        print(f"{prefix}Imported {report['imported']} of {report['total']} appointments.")
+        for entry in report['rejected']:
+            conflicts = entry.get('conflicts_with')
+            details = f" (conflicts with {conflicts})" if conflicts else ""
+            print(f"  Row {entry['row']}: {entry['reason']}{details}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Bulk import appointments')
+    parser.add_argument('path', help='.csv, .ndjson/.jsonl or .json file')
+    parser.add_argument('--no-business-hours', action='store_true',
+                        help='Skip business hours / blocked date checks (historical data)')
+    parser.add_argument('--dry-run', action='store_true', help='Validate only, do not write')
+    parser.add_argument('--chunk-size', type=int, help='Rows per transaction')
+    args = parser.parse_args()
+    
+    import_file(args.path, not args.no_business_hours, args.dry_run, args.chunk_size)
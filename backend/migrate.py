@@ -0,0 +1,66 @@
+import argparse
+import importlib.util
+import os
+from datetime import datetime
+
+from sqlalchemy import text
+
+from app import create_app, db
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+def load_migrations():
+    """Migration modules from migrations/, ordered by their numeric prefix (0001_..., 0002_...)"""
+    migrations = []
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        if not filename.endswith('.py') or not filename[:4].isdigit():
+            continue
+        spec = importlib.util.spec_from_file_location(f'migration_{filename[:-3]}', os.path.join(MIGRATIONS_DIR, filename))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        migrations.append((filename[:-3], module))
+    return migrations
+
+def applied_versions(connection):
+    connection.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version VARCHAR(100) PRIMARY KEY, applied_at TIMESTAMP NOT NULL)"
+    ))
+    connection.commit()
+    return {row[0] for row in connection.execute(text("SELECT version FROM schema_migrations"))}
+
+def migrate(list_only=False):
+    """Apply every migration in migrations/ that isn't recorded in schema_migrations yet"""
+    app = create_app()
+    
+    with app.app_context():
+        with db.engine.connect() as connection:
+            applied = applied_versions(connection)
+            
+            for version, module in load_migrations():
+                status = 'applied' if version in applied else 'pending'
+                if list_only or version in applied:
+                    print(f"[{status}] {version}: {(module.__doc__ or '').strip()}")
+                    continue
+                
+                print(f"Applying {version}...")
+                if getattr(module, 'TRANSACTIONAL', True):
+                    module.upgrade(connection)
+                else:
+                    # e.g. CREATE INDEX CONCURRENTLY can't run inside a transaction
+                    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as autocommit:
+                        module.upgrade(autocommit)
+                
+                connection.execute(
+                    text("INSERT INTO schema_migrations (version, applied_at) VALUES (:version, :applied_at)"),
+                    {'version': version, 'applied_at': datetime.utcnow()}
+                )
+                connection.commit()
+                print(f"Applied {version}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Apply pending schema migrations')
+    parser.add_argument('--list', action='store_true', help='only show applied and pending migrations')
+    args = parser.parse_args()
+    
+    migrate(args.list)
@@ -0,0 +1,25 @@
+"""Composite indexes for the hot query shapes in appointments.py, services.py and reviews.py"""
+from sqlalchemy import text
+
+# Run outside a transaction so PostgreSQL can build the indexes CONCURRENTLY
+TRANSACTIONAL = False
+
+INDEXES = [
+    # load_day_schedule(s), date range filters and the keyset listing
+    ('ix_appointments_date_start_time_id', 'appointments', 'date, start_time, id'),
+    # status filters in the listing and export
+    ('ix_appointments_status_date', 'appointments', 'status, date'),
+    # delete_service's "does this service have appointments" check
+    ('ix_appointments_service_id', 'appointments', 'service_id'),
+    # public reviews: is_approved = true ORDER BY created_at DESC
+    ('ix_reviews_is_approved_created_at', 'reviews', 'is_approved, created_at'),
+    # admin reviews: ORDER BY created_at DESC
+    ('ix_reviews_created_at', 'reviews', 'created_at'),
+    # gallery listing: ORDER BY created_at DESC
+    ('ix_gallery_images_created_at_id', 'gallery_images', 'created_at, id'),
+]
+
+def upgrade(connection):
+    concurrently = 'CONCURRENTLY ' if connection.dialect.name == 'postgresql' else ''
+    for name, table, columns in INDEXES:
+        connection.execute(text(f'CREATE INDEX {concurrently}IF NOT EXISTS {name} ON {table} ({columns})'))
@@ -0,0 +1,7 @@
+"""Add gallery_images.variants for the resized / WebP copies of each image"""
+from sqlalchemy import inspect, text
+
+def upgrade(connection):
+    columns = {column['name'] for column in inspect(connection).get_columns('gallery_images')}
+    if 'variants' not in columns:
+        connection.execute(text('ALTER TABLE gallery_images ADD COLUMN variants JSON'))
@@ -0,0 +1,10 @@
+"""Add gallery_images.content_hash for content-addressed, deduplicated uploads"""
+from sqlalchemy import inspect, text
+
+def upgrade(connection):
+    columns = {column['name'] for column in inspect(connection).get_columns('gallery_images')}
+    if 'content_hash' not in columns:
+        connection.execute(text('ALTER TABLE gallery_images ADD COLUMN content_hash VARCHAR(64)'))
+    connection.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_gallery_images_content_hash ON gallery_images (content_hash)'
+    ))
@@ -0,0 +1,17 @@
+"""Add users.tokens_valid_after and the revoked_tokens table for JWT revocation"""
+from sqlalchemy import inspect, text
+
+def upgrade(connection):
+    inspector = inspect(connection)
+    columns = {column['name'] for column in inspector.get_columns('users')}
+    if 'tokens_valid_after' not in columns:
+        connection.execute(text('ALTER TABLE users ADD COLUMN tokens_valid_after TIMESTAMP'))
+    if not inspector.has_table('revoked_tokens'):
+        connection.execute(text(
+            'CREATE TABLE revoked_tokens ('
+            'jti VARCHAR(36) PRIMARY KEY, user_id INTEGER, '
+            'expires_at TIMESTAMP NOT NULL, revoked_at TIMESTAMP)'
+        ))
+    connection.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_revoked_tokens_expires_at ON revoked_tokens (expires_at)'
+    ))
@@ -0,0 +1,7 @@
+"""Index revoked_tokens.revoked_at for the workers' poll of new revocations"""
+from sqlalchemy import text
+
+def upgrade(connection):
+    connection.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_revoked_tokens_revoked_at ON revoked_tokens (revoked_at)'
+    ))
@@ -0,0 +1,11 @@
+"""Backfill daily_appointment_stats from the existing appointments"""
+from sqlalchemy import inspect
+
+from app.models import DailyAppointmentStats
+from app.utils import stats_rollup
+
+def upgrade(connection):
+    # create_all makes the table empty on an existing database; the stats endpoint reads only the rollup
+    if not inspect(connection).has_table(DailyAppointmentStats.__tablename__):
+        DailyAppointmentStats.__table__.create(connection)
+    stats_rollup.rebuild(connection=connection)
@@ -0,0 +1,13 @@
+"""Make gallery_images.created_at NOT NULL, the keyset pagination key of GET /api/gallery/"""
+from datetime import datetime
+
+from sqlalchemy import text
+
+def upgrade(connection):
+    # Rows without a timestamp stay at the top of the list, where PostgreSQL sorted them (NULLS FIRST in DESC)
+    connection.execute(
+        text('UPDATE gallery_images SET created_at = :now WHERE created_at IS NULL'), {'now': datetime.utcnow()}
+    )
+    if connection.dialect.name == 'postgresql':
+        # SQLite can't change a column's constraints; the model's nullable=False covers new databases
+        connection.execute(text('ALTER TABLE gallery_images ALTER COLUMN created_at SET NOT NULL'))
@@ -0,0 +1,25 @@
+import argparse
+from datetime import datetime
+
+from app import create_app
+from app.utils import stats_rollup
+
+def rebuild_stats(start_date=None, end_date=None):
+    """Recompute daily_appointment_stats from the appointments table"""
+    app = create_app()
+    
+    with app.app_context():
+        rows = stats_rollup.rebuild(start_date, end_date)
+        scope = f"{start_date or 'beginning'} - {end_date or 'today and later'}"
+        print(f"Rebuilt daily appointment stats ({scope}): {rows} rollup rows.")
+
+def parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Backfill the daily appointment stats rollup')
+    parser.add_argument('--start-date', type=parse_date, help='YYYY-MM-DD, inclusive')
+    parser.add_argument('--end-date', type=parse_date, help='YYYY-MM-DD, inclusive')
+    args = parser.parse_args()
+    
+    rebuild_stats(args.start_date, args.end_date)
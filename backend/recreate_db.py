@@ -23,6 +23,9 @@ def recreate_db():
                 db.drop_all()
                 print("All tables dropped.")
                 db.create_all()
+                # New generation rows; their updated_at keeps the ETags apart from the dropped ones
+                from app.utils.reference_cache import reference_cache
+                reference_cache.ensure_generations()
                 print("All tables created.")
             except Exception as drop_error:
                 print(f"Error recreating tables: {str(drop_error)}")
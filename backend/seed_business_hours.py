@@ -1,5 +1,6 @@
 from app import create_app, db
 from app.models import BusinessHours
+from app.utils.reference_cache import BUSINESS_HOURS, reference_cache
 from datetime import time
 
 def seed_business_hours():
@@ -11,6 +12,7 @@ def seed_business_hours():
         if BusinessHours.query.count() > 0:
             print("Business hours already exist in the database. Deleting old data...")
             BusinessHours.query.delete()
+            reference_cache.bump(BUSINESS_HOURS)
             db.session.commit()
         
         # Create business hours for each day of the week
@@ -77,6 +79,7 @@ def seed_business_hours():
             )
             db.session.add(hours)
         
+        reference_cache.bump(BUSINESS_HOURS)
         db.session.commit()
         print(f"Added business hours for 7 days of the week.")
 
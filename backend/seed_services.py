@@ -1,6 +1,7 @@
 from app import create_app
 from app.models import Service
 from app import db
+from app.utils.reference_cache import SERVICES, reference_cache
 
 def seed_services():
     """Add seed data for services"""
@@ -45,6 +46,7 @@ def seed_services():
             )
             db.session.add(service)
         
+        reference_cache.bump(SERVICES)
         db.session.commit()
         print(f"Added {len(services)} services to the database.")
 
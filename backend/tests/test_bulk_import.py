@@ -0,0 +1,42 @@
+from datetime import date, time
+
+from app import db
+from app.models import Appointment, BusinessHours, Service
+from app.utils.bulk_import import import_appointments
+from app.utils.reference_cache import BUSINESS_HOURS, SERVICES, reference_cache
+
+DAY = date(2030, 1, 7)  # a Monday
+
+
+def _seed():
+    service = Service(name='Fade', duration=45, price=30)
+    db.session.add(service)
+    for day in range(7):
+        db.session.add(BusinessHours(day_of_week=day, is_open=True, open_time=time(9), close_time=time(18)))
+    reference_cache.bump(SERVICES)
+    reference_cache.bump(BUSINESS_HOURS)
+    db.session.commit()
+    return service.id
+
+
+def _rows(service_id):
+    # 10:00-10:45 and 10:30-11:15 overlap
+    return [
+        {'service_id': service_id, 'name': 'Ivan', 'phone': '0888000001', 'date': DAY.isoformat(), 'start_time': '10:00'},
+        {'service_id': service_id, 'name': 'Georgi', 'phone': '0888000002', 'date': DAY.isoformat(), 'start_time': '10:30'},
+    ]
+
+
+def test_dry_run_sees_rows_of_earlier_chunks(app):
+    service_id = _seed()
+
+    preview = import_appointments(_rows(service_id), chunk_size=1, dry_run=True)
+    assert Appointment.query.count() == 0
+    assert preview['imported'] == 1
+    assert [entry['row'] for entry in preview['rejected']] == [2]
+    assert preview['rejected'][0]['conflicts_with'] == [{'row': 1}]
+
+    report = import_appointments(_rows(service_id), chunk_size=1)
+    assert Appointment.query.count() == 1
+    assert report['imported'] == preview['imported']
+    assert [entry['row'] for entry in report['rejected']] == [2]
@@ -0,0 +1,46 @@
+from datetime import date, time, timedelta
+
+import pytest
+
+from app import db
+from app.models import Appointment, GalleryImage, Service
+from app.models.review import Review
+from app.utils.reference_cache import GALLERY, REVIEWS, SERVICES, reference_cache
+
+# The list endpoints' query count must not grow with the number of rows
+ENDPOINTS = (
+    '/api/appointments/',
+    '/api/gallery/',
+    '/api/reviews/',
+    '/api/appointments/admin/stats/',
+)
+
+
+def _seed(rows):
+    services = [Service(name=f'Service {i}', duration=30, price=20 + i) for i in range(3)]
+    db.session.add_all(services)
+    db.session.flush()
+    start = date(2030, 1, 7)
+    for i in range(rows):
+        service = services[i % len(services)]
+        db.session.add(Appointment(
+            service_id=service.id, name=f'Client {i}', phone=f'0888{i:06d}',
+            date=start + timedelta(days=i // 10), start_time=time(9 + i % 10), end_time=time(9 + i % 10, 30),
+            price=service.price, status='completed', client_rating=5
+        ))
+        db.session.add(GalleryImage(title=f'Image {i}', file_path=f'/static/uploads/{i}.jpg'))
+        db.session.add(Review(client_name=f'Client {i}', rating=5, text='Great', is_approved=True))
+    for name in (SERVICES, GALLERY, REVIEWS):
+        reference_cache.bump(name)
+    db.session.commit()
+
+
+@pytest.mark.parametrize('rows', [1, 25])
+@pytest.mark.parametrize('url', ENDPOINTS)
+def test_list_endpoints_stay_within_query_budget(app, rows, url):
+    app.config['QUERY_BUDGET_STRICT'] = True
+    _seed(rows)
+
+    # QueryBudgetExceeded propagates out of the test client
+    response = app.test_client().get(url)
+    assert response.status_code == 200
@@ -11,9 +11,9 @@ const AdminLayout = ({ children }) => {
   const navigate = useNavigate();
   const [sidebarVisible, setSidebarVisible] = useState(true);
 
-  const handleLogout = () => {
+  const handleLogout = async () => {
     if (auth) {
-      auth.logout();
+      await auth.logout();
       navigate('/admin/login');
     }
   };
@@ -1,5 +1,5 @@
 import React, { createContext, useContext, useState, useEffect } from 'react';
-import { login as apiLogin, getMe } from './api';
+import { login as apiLogin, getMe, revokeToken } from './api';
 
 // Create the auth context
 const AuthContext = createContext(null);
@@ -94,8 +94,9 @@ export const AuthProvider = ({ children }) => {
     }
   };
 
-  const logout = () => {
+  const logout = async () => {
     console.log('Logging out');
+    await revokeToken();
     localStorage.removeItem('token');
     setIsAuthenticated(false);
     setIsAdmin(false);
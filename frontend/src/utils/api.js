@@ -102,7 +102,19 @@ export const login = async (credentials) => {
   }
 };
 
-export const logout = () => {
+// Revokes the current token on the server; the token is dropped locally either way.
+// Await it before navigating away - a page change aborts the request.
+export const revokeToken = () => {
+  const token = localStorage.getItem('token');
+  if (!token) return Promise.resolve();
+  return API.post('/auth/logout', null, {
+    headers: { Authorization: `Bearer ${token}` },
+    timeout: 3000 // не блокираме изхода, ако сървърът не отговаря
+  }).catch(() => {});
+};
+
+export const logout = async () => {
+  await revokeToken();
   localStorage.removeItem('token');
   delete API.defaults.headers.common['Authorization'];
   window.location.href = '/admin/login';